@@ -2,11 +2,14 @@ import os
 import time
 import signal
 import sys
-import json
+import struct
+import functools
 import threading
-import subprocess
-import importlib.util
+import weakref
+import shutil
+from contextlib import contextmanager
 from src.plugin_loader import PluginLoader
+from src.plugin_printer import PluginPrinter, install_plugin_printer, uninstall_plugin_printer
 from src.logger import get_logger
 from src.config_manager import get_config_manager
 
@@ -14,104 +17,270 @@ from src.config_manager import get_config_manager
 logger = get_logger()
 config_manager = get_config_manager()
 
+# 程序目录及相关文件路径（在导入时计算一次）
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INSTANCE_FILE = os.path.join(BASE_DIR, '.kaos_instance')
+EULA_AGREED_FILE = os.path.join(BASE_DIR, '.eula_agreed')
+EULA_FILE = os.path.join(BASE_DIR, 'EULA.md')
+PRIVACY_FILE = os.path.join(BASE_DIR, 'PrivacyPolicy.txt')
+PLUGINS_DIR = os.path.join(BASE_DIR, 'plugins')
+
+class _InstanceSentinel:
+    """实例文件清理回调绑定的哨兵类型（object()不支持弱引用，不能直接用作finalize的目标）"""
+
+# 实例文件清理回调绑定的哨兵对象，其生命周期与模块相同
+instance_sentinel = _InstanceSentinel()
+
+# 本脚本的真实路径，用于确认实例文件中的PID是否仍是Kaos进程
+KAOS_SCRIPT = os.path.realpath(__file__)
+
+# 重启时使用的解释器和参数（在导入时确定，重启过程中无需再分配）
+RESTART_EXECUTABLE = sys.executable
+RESTART_ARGV = [sys.executable, *sys.argv]
+
 # 全局变量用于控制程序运行状态
 running = True
 restart_requested = False
+# 退出或重启请求时置位，主线程在此事件上阻塞等待
+stop_event = threading.Event()
+# 主线程是否正在stop_event上等待；其他阶段（EULA确认、依赖安装、插件加载、退出提示）Ctrl+C直接退出
+main_loop_waiting = False
+# Windows下无超时的Event.wait()无法被Ctrl+C打断，需要定期返回以处理信号
+MAIN_WAIT_TIMEOUT = 1.0 if os.name == 'nt' else None
+
+# 运行所需的依赖包
+REQUIRED_PACKAGES = [
+    'toml',  # 用于解析TOML配置文件
+    'requests'  # 用于HTTP请求
+]
+
+# read_key返回的按键字符（Ctrl+R对应的ASCII码是18）
+CTRL_R = '\x12'
+ENTER = '\r'
+
+# 实例文件中每条PID记录的格式（8字节小端无符号整数）
+PID_RECORD = struct.Struct('<Q')
+MAX_PID = 0xFFFFFFFF
+# Windows下文件锁定的字节范围
+INSTANCE_LOCK_SIZE = 0x7FFFFFFF
 
 def signal_handler(sig, frame):
     global running
     logger.info("\n正在退出Kaos...")
     running = False
-    sys.exit(0)
+    if not main_loop_waiting:
+        # 主循环之外没有人等待stop_event，直接退出（input()等阻塞调用会被打断）
+        sys.exit(0)
+    stop_event.set()
 
 def restart_program():
-    """重启程序"""
+    """请求重启程序：只设置标志并唤醒主线程，实际重启由主线程在清理后通过do_restart完成"""
     global running, restart_requested
     logger.info("\n正在重启Kaos...")
     running = False
     restart_requested = True
-    # 清理实例文件
-    instance_file = os.path.join(os.path.dirname(__file__), '.kaos_instance')
+    stop_event.set()
+
+def do_restart(instance_file=INSTANCE_FILE):
+    """
+    清理实例文件后用新的Kaos进程替换当前进程
+    :param instance_file: 当前进程登记的实例文件路径
+    """
     cleanup_instance_file(instance_file)
-    # 重新启动程序
-    python = sys.executable
-    os.execl(python, python, *sys.argv)
+    # execve不会执行atexit，先写完排队中的文件日志
+    logger.flush()
+    sys.stdout.flush()
+    # 直接替换当前进程：POSIX下保留PID和终端前台进程组，新实例仍可从终端读取输入
+    os.execve(RESTART_EXECUTABLE, RESTART_ARGV, os.environ)
 
 def check_and_install_dependencies():
-    """检查并安装必要的依赖"""
-    required_packages = [
-        'toml',  # 用于解析TOML配置文件
-        'requests'  # 用于HTTP请求
-    ]
+    """
+    检查必要的依赖，缺失时在后台启动pip安装
+    :return: pip进程对象，无需安装或启动失败时返回None
+    """
+    import subprocess
     
-    missing_packages = []
+    # 已安装发行包只扫描一次并缓存，避免逐个调用find_spec
+    missing_packages = [package for package in REQUIRED_PACKAGES
+                        if not is_package_installed(package)]
+    if not missing_packages:
+        return None
     
-    # 检查每个包是否已安装
-    for package in required_packages:
-        if not is_package_installed(package):
-            missing_packages.append(package)
+    logger.info(f"检测到缺失的依赖包: {', '.join(missing_packages)}")
+    logger.info("正在后台安装缺失的依赖...")
     
-    # 如果有缺失的包，则安装它们
-    if missing_packages:
-        logger.info(f"检测到缺失的依赖包: {', '.join(missing_packages)}")
-        logger.info("正在自动安装缺失的依赖...")
-        
-        try:
-            # 使用pip安装缺失的包
-            subprocess.check_call([
-                sys.executable, '-m', 'pip', 'install', '--user'
-            ] + missing_packages)
-            
-            logger.info("依赖安装完成!")
-            
-            # 重新检查安装结果
-            still_missing = []
-            for package in missing_packages:
-                if not is_package_installed(package):
-                    still_missing.append(package)
-            
-            if still_missing:
-                logger.warning(f"以下包可能安装失败: {', '.join(still_missing)}")
-                logger.warning("某些功能可能无法正常工作")
-            else:
-                logger.info("所有依赖均已成功安装")
-                
-        except subprocess.CalledProcessError as e:
-            logger.error(f"安装依赖时出错: {e}")
-            logger.warning("某些功能可能无法正常工作")
-        except Exception as e:
-            logger.error(f"安装依赖时发生未知错误: {e}")
-            logger.warning("某些功能可能无法正常工作")
+    try:
+        # pip以异步方式运行，与插件加载并行进行，稍后由wait_for_dependencies等待结束
+        return subprocess.Popen([
+            sys.executable, '-m', 'pip', 'install', '--user',
+            '--disable-pip-version-check', '--no-input'
+        ] + missing_packages, stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    except Exception as e:
+        logger.error(f"启动依赖安装时发生错误: {e}")
+        logger.warning("某些功能可能无法正常工作")
+        return None
+
+def wait_for_dependencies(pip_process):
+    """
+    等待后台pip进程结束并检查安装结果
+    :param pip_process: check_and_install_dependencies返回的进程对象
+    """
+    if pip_process is None:
+        return
+    
+    # communicate会读完输出再等待，避免管道写满导致pip阻塞
+    output, _ = pip_process.communicate()
+    for line in output.decode(errors='replace').splitlines():
+        if line.strip():
+            logger.debug(line)
+    
+    if pip_process.returncode != 0:
+        logger.error(f"安装依赖时出错: pip退出码 {pip_process.returncode}")
+    else:
+        logger.info("依赖安装完成!")
+    
+    # 清除缓存后重新扫描一次，检查安装结果
+    get_installed_distributions.cache_clear()
+    still_missing = [package for package in REQUIRED_PACKAGES
+                     if not is_package_installed(package)]
+    
+    if still_missing:
+        logger.warning(f"以下包可能安装失败: {', '.join(still_missing)}")
+        logger.warning("某些功能可能无法正常工作")
+    else:
+        logger.info("所有依赖均已成功安装")
+
+@functools.lru_cache(maxsize=1)
+def get_installed_distributions():
+    """获取已安装发行包名称的集合（小写，结果会被缓存）"""
+    import importlib.metadata
+    
+    names = set()
+    for dist in importlib.metadata.distributions():
+        name = dist.metadata['Name']
+        if name:
+            names.add(name.lower())
+    return frozenset(names)
 
 def is_package_installed(package_name):
     """检查包是否已安装"""
-    try:
-        importlib.util.find_spec(package_name)
-        return True
-    except ImportError:
-        return False
+    return package_name.lower() in get_installed_distributions()
+
+class ConsoleKeyReader:
+    """Windows控制台按键读取器
+    
+    在内核中阻塞等待控制台输入事件，而不是以固定间隔轮询msvcrt.kbhit()，
+    空闲时不占用CPU。调用stop()可唤醒并结束等待中的线程。
+    """
+    STD_INPUT_HANDLE = -10
+    KEY_EVENT = 0x0001
+    WAIT_OBJECT_0 = 0x00000000
+    INFINITE = 0xFFFFFFFF
+    
+    def __init__(self):
+        import ctypes
+        
+        class KEY_EVENT_RECORD(ctypes.Structure):
+            _fields_ = [
+                ('bKeyDown', ctypes.c_int),
+                ('wRepeatCount', ctypes.c_ushort),
+                ('wVirtualKeyCode', ctypes.c_ushort),
+                ('wVirtualScanCode', ctypes.c_ushort),
+                ('uChar', ctypes.c_wchar),
+                ('dwControlKeyState', ctypes.c_uint32),
+            ]
+        
+        class INPUT_RECORD(ctypes.Structure):
+            _fields_ = [
+                ('EventType', ctypes.c_ushort),
+                ('KeyEvent', KEY_EVENT_RECORD),
+            ]
+        
+        self._ctypes = ctypes
+        self._record_type = INPUT_RECORD
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetStdHandle.restype = ctypes.c_void_p
+        kernel32.CreateEventW.restype = ctypes.c_void_p
+        kernel32.WaitForMultipleObjects.argtypes = [
+            ctypes.c_uint32, ctypes.POINTER(ctypes.c_void_p), ctypes.c_int, ctypes.c_uint32
+        ]
+        kernel32.WaitForMultipleObjects.restype = ctypes.c_uint32
+        kernel32.ReadConsoleInputW.argtypes = [
+            ctypes.c_void_p, ctypes.POINTER(INPUT_RECORD), ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32)
+        ]
+        kernel32.SetEvent.argtypes = [ctypes.c_void_p]
+        self._kernel32 = kernel32
+        
+        console_handle = kernel32.GetStdHandle(self.STD_INPUT_HANDLE)
+        # 手动重置的事件，由主线程在退出时置位以唤醒监听线程
+        self._stop_handle = kernel32.CreateEventW(None, True, False, None)
+        if not console_handle or not self._stop_handle:
+            raise ctypes.WinError()
+        self._handles = (ctypes.c_void_p * 2)(console_handle, self._stop_handle)
+    
+    def read_key(self, timeout=None):
+        """
+        等待一次按键
+        :param timeout: 超时时间（秒），None表示一直等待
+        :return: 按键对应的字符；超时或已停止时返回None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        record = self._record_type()
+        count = self._ctypes.c_uint32(0)
+        while True:
+            if deadline is None:
+                wait_ms = self.INFINITE
+            else:
+                wait_ms = max(0, int((deadline - time.monotonic()) * 1000))
+            result = self._kernel32.WaitForMultipleObjects(2, self._handles, False, wait_ms)
+            if result != self.WAIT_OBJECT_0:
+                # 停止事件被置位、等待超时或等待失败
+                return None
+            if not self._kernel32.ReadConsoleInputW(self._handles[0], record, 1, count):
+                raise self._ctypes.WinError()
+            key_event = record.KeyEvent
+            if count.value and record.EventType == self.KEY_EVENT and key_event.bKeyDown and key_event.uChar:
+                return key_event.uChar
+    
+    def stop(self):
+        """唤醒所有等待中的read_key调用"""
+        self._kernel32.SetEvent(self._stop_handle)
+
+console_key_reader = None
+
+def get_console_key_reader():
+    """获取全局控制台按键读取器（仅Windows）"""
+    global console_key_reader
+    if console_key_reader is None:
+        console_key_reader = ConsoleKeyReader()
+    return console_key_reader
 
 def check_restart_key():
     """检查Ctrl+R组合键"""
     global restart_requested
-    try:
-        import msvcrt
+    if os.name == 'nt':
+        try:
+            reader = get_console_key_reader()
+        except Exception as e:
+            logger.warning(f"键盘监听出现异常: {e}")
+            return
         logger.info("键盘监听已启动，按Ctrl+R可重启程序")
         while running and not restart_requested:
             try:
-                if msvcrt.kbhit():
-                    key = msvcrt.getch()
-                    # 检查Ctrl+R组合键 (Ctrl+R对应的ASCII码是18)
-                    if ord(key) == 18:  # Ctrl+R
-                        logger.info("检测到Ctrl+R组合键，正在重启程序...")
-                        restart_requested = True
-                        restart_program()
-                        break
-                time.sleep(0.05)  # 减少延迟以提高响应性
+                key = reader.read_key()
+                if key is None:
+                    break  # 监听已停止
+                # 检查Ctrl+R组合键
+                if key == CTRL_R:
+                    logger.info("检测到Ctrl+R组合键，正在重启程序...")
+                    restart_requested = True
+                    restart_program()
+                    break
             except Exception as e:
                 logger.warning(f"键盘监听循环中出现异常: {e}")
                 time.sleep(0.1)  # 出现异常时稍作延迟
-    except ImportError:
+    else:
         # 非Windows系统使用keyboard库
         try:
             import keyboard
@@ -120,76 +289,270 @@ def check_restart_key():
             keyboard.wait()
         except ImportError:
             logger.warning("未安装keyboard库，无法使用Ctrl+R重启功能")
-    except Exception as e:
-        logger.warning(f"键盘监听出现异常: {e}")
+        except Exception as e:
+            logger.warning(f"键盘监听出现异常: {e}")
 
 def manage_multiple_instances():
     """管理多个kaos实例，确保只保留最后一个实例"""
     # 创建一个临时文件来标识当前实例
-    instance_file = os.path.join(os.path.dirname(__file__), '.kaos_instance')
+    instance_file = INSTANCE_FILE
+    current_pid = os.getpid()
     
-    # 检查是否已存在实例文件
-    if os.path.exists(instance_file):
-        try:
-            # 读取现有实例文件中的PID
-            with open(instance_file, 'r') as f:
-                existing_pids = f.read().strip().split('\n')
-            
+    try:
+        with locked_instance_file(instance_file) as fd:
             # 通知所有现有实例退出
-            current_pid = str(os.getpid())
-            new_pids = []
+            kill_list = [pid for pid in read_instance_pids(fd) if pid != current_pid]
+            for pid in terminate_processes(kill_list):
+                logger.info(f"已通知PID {pid} 的kaos实例退出")
             
-            for pid in existing_pids:
-                if pid and pid != current_pid:
-                    try:
-                        # 在Windows上使用taskkill命令终止进程
-                        os.system(f"taskkill /F /PID {pid} >nul 2>&1")
-                        print(f"10-19 22:48:37 [主程序] 已通知PID {pid} 的kaos实例退出")
-                    except Exception:
-                        pass  # 进程可能已经退出
-                else:
-                    new_pids.append(pid)
-            
-            # 添加当前PID到列表中
-            new_pids.append(current_pid)
-            
-            # 更新实例文件
-            with open(instance_file, 'w') as f:
-                f.write('\n'.join(new_pids))
-                
-        except Exception as e:
-            # 如果读取失败，创建新的实例文件
-            with open(instance_file, 'w') as f:
-                f.write(str(os.getpid()))
-    else:
-        # 创建新的实例文件
-        with open(instance_file, 'w') as f:
-            f.write(str(os.getpid()))
+            # 更新实例文件，只保留当前PID
+            write_instance_pids(fd, [current_pid])
+    except OSError as e:
+        logger.warning(f"无法更新实例文件: {e}")
     
     return instance_file
 
-def cleanup_instance_file(instance_file):
-    """清理实例文件"""
-    if instance_file and os.path.exists(instance_file):
+@contextmanager
+def locked_instance_file(instance_file, create=True):
+    """
+    以独占锁打开实例文件，并发启动的实例会在此处排队
+    :param instance_file: 实例文件路径
+    :param create: 文件不存在时是否创建
+    :return: 文件描述符
+    """
+    flags = os.O_RDWR | getattr(os, 'O_BINARY', 0)
+    if create:
+        flags |= os.O_CREAT
+    fd = os.open(instance_file, flags, 0o600)
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_LOCK, INSTANCE_LOCK_SIZE)
+            try:
+                yield fd
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, INSTANCE_LOCK_SIZE)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield fd  # 关闭文件描述符时自动释放锁
+    finally:
+        os.close(fd)
+
+def read_instance_pids(fd):
+    """读取实例文件中的全部PID（每个PID为8字节小端无符号整数）"""
+    os.lseek(fd, 0, os.SEEK_SET)
+    chunks = []
+    while True:
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    data = b''.join(chunks)
+    if len(data) % PID_RECORD.size:
+        # 旧版本的文本格式或已损坏的文件，直接忽略
+        return []
+    return [pid for (pid,) in PID_RECORD.iter_unpack(data) if 0 < pid <= MAX_PID]
+
+def write_instance_pids(fd, pids):
+    """用给定的PID列表覆盖实例文件"""
+    data = b''.join(PID_RECORD.pack(pid) for pid in pids)
+    os.lseek(fd, 0, os.SEEK_SET)
+    os.write(fd, data)
+    os.ftruncate(fd, len(data))
+
+def terminate_processes(pids):
+    """终止指定PID的进程，不创建任何子进程
+    :param pids: PID列表（字符串或整数）
+    :return: 已发送终止请求的PID列表
+    """
+    if os.name == 'nt':
+        return terminate_windows_processes(pids)
+    
+    terminated = []
+    for pid in pids:
         try:
-            # 从文件中移除当前PID
-            current_pid = str(os.getpid())
-            if os.path.exists(instance_file):
-                with open(instance_file, 'r') as f:
-                    pids = f.read().strip().split('\n')
-                
-                # 过滤掉当前PID
-                new_pids = [pid for pid in pids if pid and pid != current_pid]
-                
-                if new_pids:
-                    # 如果还有其他PID，写回文件
-                    with open(instance_file, 'w') as f:
-                        f.write('\n'.join(new_pids))
-                else:
-                    # 如果没有其他PID，删除文件
-                    os.remove(instance_file)
-        except Exception:
-            pass
+            # 实例文件可能是崩溃后残留的，PID可能已被无关进程复用，只向确认是Kaos的进程发信号
+            if not is_kaos_process(int(pid)):
+                continue
+            os.kill(int(pid), signal.SIGTERM)
+            terminated.append(pid)
+        except (ValueError, OverflowError, OSError):
+            pass  # 进程可能已经退出
+    return terminated
+
+def is_kaos_process(pid):
+    """
+    通过/proc确认PID对应的进程是否正在运行本脚本（POSIX）
+    :param pid: 进程ID
+    :return: 命令行参数中包含本脚本时返回True；无法确认（如没有/proc或无权限）时返回False
+    """
+    try:
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            args = f.read().split(b'\0')[:-1]
+        cwd = os.readlink(f'/proc/{pid}/cwd')
+    except OSError:
+        return False
+    # 第一个参数是解释器，其后任一参数解析为本脚本即视为Kaos进程
+    for arg in args[1:]:
+        if os.path.realpath(os.path.join(cwd, os.fsdecode(arg))) == KAOS_SCRIPT:
+            return True
+    return False
+
+def is_kaos_windows_process(kernel32, handle):
+    """
+    通过进程映像路径和命令行确认进程是否正在运行本脚本（Windows）
+    :param kernel32: 已设置好OpenProcess等函数签名的kernel32
+    :param handle: 至少具有PROCESS_QUERY_LIMITED_INFORMATION权限的进程句柄
+    :return: 解释器与当前相同且命令行参数包含本脚本时返回True；无法确认时返回False
+    """
+    import ctypes
+    from ctypes import wintypes
+    STATUS_INFO_LENGTH_MISMATCH = 0xC0000004
+    # ProcessCommandLineInformation（Windows 8.1起可用），结果为UNICODE_STRING及其后的命令行内容
+    PROCESS_COMMAND_LINE_INFORMATION = 60
+    
+    class UNICODE_STRING(ctypes.Structure):
+        _fields_ = [('Length', wintypes.USHORT), ('MaximumLength', wintypes.USHORT), ('Buffer', ctypes.c_void_p)]
+    
+    kernel32.QueryFullProcessImageNameW.argtypes = [
+        ctypes.c_void_p, ctypes.c_uint32, ctypes.c_wchar_p, ctypes.POINTER(ctypes.c_uint32)
+    ]
+    kernel32.LocalFree.argtypes = [ctypes.c_void_p]
+    ntdll = ctypes.WinDLL('ntdll')
+    ntdll.NtQueryInformationProcess.argtypes = [
+        ctypes.c_void_p, ctypes.c_uint32, ctypes.c_void_p, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32)
+    ]
+    ntdll.NtQueryInformationProcess.restype = ctypes.c_uint32
+    shell32 = ctypes.WinDLL('shell32')
+    shell32.CommandLineToArgvW.argtypes = [ctypes.c_wchar_p, ctypes.POINTER(ctypes.c_int)]
+    shell32.CommandLineToArgvW.restype = ctypes.POINTER(ctypes.c_wchar_p)
+    
+    # 解释器必须与当前进程相同
+    size = ctypes.c_uint32(32768)
+    image = ctypes.create_unicode_buffer(size.value)
+    if not kernel32.QueryFullProcessImageNameW(handle, 0, image, ctypes.byref(size)):
+        return False
+    if os.path.normcase(os.path.realpath(image.value)) != os.path.normcase(os.path.realpath(RESTART_EXECUTABLE)):
+        return False
+    
+    # 读取命令行，缓冲区不足时按返回的长度重试
+    length = ctypes.c_uint32(4096)
+    while True:
+        buffer = ctypes.create_string_buffer(length.value)
+        status = ntdll.NtQueryInformationProcess(
+            handle, PROCESS_COMMAND_LINE_INFORMATION, buffer, length.value, ctypes.byref(length)
+        )
+        if status != STATUS_INFO_LENGTH_MISMATCH:
+            break
+    if status != 0:
+        return False
+    command_line = UNICODE_STRING.from_buffer(buffer)
+    if not command_line.Buffer:
+        return False
+    text = ctypes.wstring_at(command_line.Buffer, command_line.Length // 2)
+    
+    argc = ctypes.c_int()
+    argv = shell32.CommandLineToArgvW(text, ctypes.byref(argc))
+    if not argv:
+        return False
+    try:
+        args = [argv[i] for i in range(argc.value)]
+    finally:
+        kernel32.LocalFree(argv)
+    # 第一个参数是解释器；工作目录未知，相对路径只比较文件名，绝对路径须解析为本脚本
+    script = os.path.normcase(KAOS_SCRIPT)
+    script_name = os.path.basename(script)
+    for arg in args[1:]:
+        if os.path.isabs(arg):
+            if os.path.normcase(os.path.realpath(arg)) == script:
+                return True
+        elif os.path.basename(os.path.normcase(arg)) == script_name:
+            return True
+    return False
+
+def terminate_windows_processes(pids, wait_timeout_ms=500):
+    """
+    批量终止Windows进程：一次性打开全部句柄并终止，再用WaitForMultipleObjects确认退出
+    :param pids: PID列表（字符串或整数）
+    :param wait_timeout_ms: 等待进程退出的最长时间（毫秒）
+    :return: 已发送终止请求的PID列表
+    """
+    import ctypes
+    PROCESS_TERMINATE = 0x0001
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    SYNCHRONIZE = 0x00100000
+    ERROR_ACCESS_DENIED = 5
+    MAXIMUM_WAIT_OBJECTS = 64
+    
+    kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+    kernel32.OpenProcess.argtypes = [ctypes.c_uint32, ctypes.c_int, ctypes.c_uint32]
+    kernel32.OpenProcess.restype = ctypes.c_void_p
+    kernel32.TerminateProcess.argtypes = [ctypes.c_void_p, ctypes.c_uint32]
+    kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+    kernel32.WaitForMultipleObjects.argtypes = [
+        ctypes.c_uint32, ctypes.POINTER(ctypes.c_void_p), ctypes.c_int, ctypes.c_uint32
+    ]
+    kernel32.WaitForMultipleObjects.restype = ctypes.c_uint32
+    
+    terminated = []
+    wait_handles = []
+    try:
+        for pid in pids:
+            try:
+                pid_value = int(pid)
+            except ValueError:
+                continue
+            access = PROCESS_TERMINATE | PROCESS_QUERY_LIMITED_INFORMATION
+            handle = kernel32.OpenProcess(access | SYNCHRONIZE, False, pid_value)
+            can_wait = bool(handle)
+            if not handle and ctypes.get_last_error() == ERROR_ACCESS_DENIED:
+                # 无权等待该进程时退回到仅终止、不确认退出
+                handle = kernel32.OpenProcess(access, False, pid_value)
+            if not handle:
+                continue  # 进程可能已经退出
+            # 实例文件可能是崩溃后残留的，PID可能已被无关进程复用，只终止确认是Kaos的进程
+            if not is_kaos_windows_process(kernel32, handle):
+                kernel32.CloseHandle(handle)
+                continue
+            if kernel32.TerminateProcess(handle, 1):
+                terminated.append(pid)
+            if can_wait:
+                wait_handles.append(handle)
+            else:
+                kernel32.CloseHandle(handle)
+        
+        # 确认被终止的进程已经退出，每次最多等待64个句柄
+        for i in range(0, len(wait_handles), MAXIMUM_WAIT_OBJECTS):
+            batch = wait_handles[i:i + MAXIMUM_WAIT_OBJECTS]
+            handle_array = (ctypes.c_void_p * len(batch))(*batch)
+            kernel32.WaitForMultipleObjects(len(batch), handle_array, True, wait_timeout_ms)
+    finally:
+        for handle in wait_handles:
+            kernel32.CloseHandle(handle)
+    return terminated
+
+def cleanup_instance_file(instance_file=INSTANCE_FILE):
+    """清理实例文件"""
+    if not instance_file:
+        return
+    try:
+        # 从文件中移除当前PID（直接打开，文件不存在时不再额外stat）
+        current_pid = os.getpid()
+        with locked_instance_file(instance_file, create=False) as fd:
+            new_pids = [pid for pid in read_instance_pids(fd) if pid != current_pid]
+            # 如果还有其他PID，写回文件
+            write_instance_pids(fd, new_pids)
+        
+        if not new_pids:
+            # 如果没有其他PID，删除文件
+            os.remove(instance_file)
+    except FileNotFoundError:
+        return
+    except Exception:
+        pass
 
 def format_loading_message(plugin_loader):
     logger.info("欢迎使用Kaos系统！")
@@ -212,57 +575,113 @@ def format_loading_message(plugin_loader):
     
     plugins = plugin_loader.get_plugins()
     
-    # 校验插件manifest
-    valid_plugins = []
+    # 校验插件manifest（单次遍历，校验通过的插件即为启用的插件）
+    validate = plugin_loader.validate_manifest
+    enabled_plugins = []
     for plugin in plugins:
-        manifest = plugin['manifest']
-        # 使用PluginLoader的validate_manifest方法校验
-        if plugin_loader.validate_manifest(manifest):
-            valid_plugins.append(plugin)
+        if validate(plugin['manifest']):
+            enabled_plugins.append(plugin)
         else:
-            logger.warning(f"插件 {manifest['pluginName']} 的manifest校验失败，跳过加载")
-    
-    enabled_plugins = [p for p in valid_plugins if p]  # 这里简化处理，实际可能需要检查插件是否启用
-    disabled_plugins_count = len(valid_plugins) - len(enabled_plugins)
+            logger.warning(f"插件 {plugin['manifest']['pluginName']} 的manifest校验失败，跳过加载")
     
     logger.info("🎉 插件系统加载完成!")
     logger.info(f"📊 总览: {len(enabled_plugins)}个插件")
     logger.info("📋 已加载插件详情:")
     
-    for i, plugin in enumerate(enabled_plugins):
-        manifest = plugin['manifest']
-        logger.info(f"✅ 插件加载成功: {manifest['pluginName']} v{manifest['version']} () - {manifest['Developer']}")
-        # 调用插件的启动函数
-        if hasattr(plugin['module'], 'start_plugin'):
-            try:
-                logger.info(f"🚀 正在启动插件: {manifest['pluginName']}")
-                # 从插件模块中获取api_registry对象
-                api_registry = getattr(plugin['module'], 'api_registry', None)
-                
-                # 使用插件上下文管理器，使插件的print函数带前缀
-                from src.plugin_printer import plugin_context
-                with plugin_context(manifest['pluginName']):
-                    plugin['module'].start_plugin(api_registry, plugin_loader)
-                
-                logger.info(f"✅ 插件 {manifest['pluginName']} 启动完成")
-            except Exception as e:
-                logger.error(f"插件 {manifest['pluginName']} 启动失败: {e}")
-        else:
-            logger.warning(f"插件 {manifest['pluginName']} 没有start_plugin函数")
+    # 一次性取出展示所需的字段，避免循环中重复查找manifest
+    plugin_details = [
+        (manifest['pluginName'], manifest['version'], manifest['Developer'])
+        for manifest in (plugin['manifest'] for plugin in enabled_plugins)
+    ]
+    for name, version, developer in plugin_details:
+        logger.info(f"✅ 插件加载成功: {name} v{version} () - {developer}")
+    
+    # print只替换一次，各工作线程只需设置自己的插件名称
+    install_plugin_printer()
+    try:
+        start_plugin_layers(enabled_plugins, plugin_loader)
+    finally:
+        uninstall_plugin_printer()
     
     logger.info("-" * 32)
     logger.info("全部系统初始化完成，监听已启动，Kaos正常运作中~")
     logger.info("-" * 32)
 
+def start_plugin_layers(plugins, plugin_loader):
+    """
+    按依赖关系分层启动插件，同一层内互不依赖的插件并行启动
+    :param plugins: 已启用的插件列表
+    :param plugin_loader: 插件加载器（提供加载时计算好的依赖分层）
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    enabled = {id(plugin) for plugin in plugins}
+    for layer in plugin_loader.get_plugin_layers():
+        layer = [plugin for plugin in layer if id(plugin) in enabled]
+        if not layer:
+            continue
+        max_workers = min(len(layer), 32, (os.cpu_count() or 4) * 2)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='plugin-start') as executor:
+            futures = {
+                executor.submit(start_single_plugin, plugin, plugin_loader): plugin['manifest']['pluginName']
+                for plugin in layer
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    if future.result():
+                        logger.info(f"✅ 插件 {name} 启动完成")
+                except Exception as e:
+                    logger.error(f"插件 {name} 启动失败: {e}")
+
+def start_single_plugin(plugin, plugin_loader):
+    """
+    调用单个插件的启动函数（在线程池中执行）
+    :return: 插件有start_plugin函数并已调用时返回True
+    """
+    name = plugin['manifest']['pluginName']
+    module = plugin['module']
+    start_plugin = getattr(module, 'start_plugin', None)
+    if start_plugin is None:
+        logger.warning(f"插件 {name} 没有start_plugin函数")
+        return False
+    
+    logger.info(f"🚀 正在启动插件: {name}")
+    # 从插件模块中获取api_registry对象
+    api_registry = getattr(module, 'api_registry', None)
+    
+    # print已由调用方统一替换，这里只设置当前线程的插件名称，使插件的print输出带前缀
+    token = PluginPrinter.set_current_plugin(name)
+    try:
+        start_plugin(api_registry, plugin_loader)
+    finally:
+        PluginPrinter.reset_current_plugin(token)
+    return True
+
 def check_eula_agreement():
     """检查用户是否已同意EULA和隐私条款"""
-    agreement_file = os.path.join(os.path.dirname(__file__), '.eula_agreed')
-    return os.path.exists(agreement_file)
+    return os.path.exists(EULA_AGREED_FILE)
+
+def print_file(file_path):
+    """将文件内容直接输出到控制台，不在内存中解码整个文件"""
+    # 标准输出可能没有底层二进制缓冲区（如被替换为StringIO）
+    stdout_buffer = getattr(sys.stdout, 'buffer', None)
+    # 文件为UTF-8编码，只有控制台同为UTF-8时才能直接写入字节
+    encoding = (getattr(sys.stdout, 'encoding', None) or '').lower().replace('-', '')
+    if stdout_buffer is None or encoding != 'utf8':
+        with open(file_path, 'r', encoding='utf-8') as f:
+            print(f.read())
+        return
+    
+    sys.stdout.flush()
+    with open(file_path, 'rb') as f:
+        shutil.copyfileobj(f, stdout_buffer)
+    stdout_buffer.flush()
+    print()
 
 def show_eula_and_privacy_policy():
     """显示EULA和隐私条款并请求用户同意"""
-    eula_file = os.path.join(os.path.dirname(__file__), 'EULA.md')
-    privacy_file = os.path.join(os.path.dirname(__file__), 'PrivacyPolicy.txt')
+    eula_file = EULA_FILE
+    privacy_file = PRIVACY_FILE
     
     print("=" * 50)
     print("Kaos 最终用户许可协议和隐私条款")
@@ -271,14 +690,12 @@ def show_eula_and_privacy_policy():
     # 显示EULA
     if os.path.exists(eula_file):
         print("\n最终用户许可协议 (EULA):\n")
-        with open(eula_file, 'r', encoding='utf-8') as f:
-            print(f.read())
+        print_file(eula_file)
     
     # 显示隐私条款
     if os.path.exists(privacy_file):
         print("\n隐私条款:\n")
-        with open(privacy_file, 'r', encoding='utf-8') as f:
-            print(f.read())
+        print_file(privacy_file)
     
     print("=" * 50)
     print("请仔细阅读以上条款。使用本软件表示您同意这些条款。")
@@ -288,8 +705,7 @@ def show_eula_and_privacy_policy():
         response = input("\n您同意以上条款吗？(输入 'yes' 表示同意，'no' 表示不同意): ").strip().lower()
         if response == 'yes':
             # 创建同意文件
-            agreement_file = os.path.join(os.path.dirname(__file__), '.eula_agreed')
-            with open(agreement_file, 'w') as f:
+            with open(EULA_AGREED_FILE, 'w') as f:
                 f.write("User agreed to EULA and Privacy Policy on " + time.strftime("%Y-%m-%d %H:%M:%S"))
             print("感谢您的同意！现在将启动Kaos系统。")
             return True
@@ -307,9 +723,8 @@ if __name__ == "__main__":
     # 管理多个kaos实例
     instance_file = manage_multiple_instances()
     
-    # 确保在程序退出时清理实例文件
-    import atexit
-    atexit.register(cleanup_instance_file, instance_file)
+    # 确保在程序退出时清理实例文件（finalize在模块全局变量被清空之前执行）
+    weakref.finalize(instance_sentinel, cleanup_instance_file, instance_file)
     
     # 检查EULA和隐私条款同意情况
     if not check_eula_agreement():
@@ -317,14 +732,16 @@ if __name__ == "__main__":
             cleanup_instance_file(instance_file)
             sys.exit(0)
     
-    # 检查并安装必要的依赖
-    check_and_install_dependencies()
+    # 检查必要的依赖，缺失的包在加载插件的同时后台安装
+    pip_process = check_and_install_dependencies()
     
     # Load plugins
-    plugins_dir = os.path.join(os.path.dirname(__file__), 'plugins')
-    plugin_loader = PluginLoader(plugins_dir)
+    plugin_loader = PluginLoader(PLUGINS_DIR)
     plugin_loader.load_plugins()
     
+    # 插件启动前等待依赖安装完成
+    wait_for_dependencies(pip_process)
+    
     # Display formatted loading message
     format_loading_message(plugin_loader)
     
@@ -336,49 +753,50 @@ if __name__ == "__main__":
     
     # 持续运行循环
     try:
-        while running and not restart_requested:
-            try:
-                # 每隔1秒检查一次运行状态
-                time.sleep(1)
-            except KeyboardInterrupt:
-                logger.info("\n正在退出Kaos...")
-                break
+        try:
+            # 阻塞等待退出或重启请求，空闲时不再周期性唤醒
+            main_loop_waiting = True
+            while not stop_event.wait(MAIN_WAIT_TIMEOUT):
+                pass
+        except KeyboardInterrupt:
+            logger.info("\n正在退出Kaos...")
+        finally:
+            main_loop_waiting = False
     except Exception as e:
         logger.error(f"\nKaos发生未处理的异常: {e}")
         logger.info("按回车键退出或按Ctrl+R重启...")
         try:
-            import msvcrt
-            start_time = time.time()
-            while True:
-                # 检查是否超时（30秒后自动退出）
-                if time.time() - start_time > 30:
-                    logger.info("超时自动退出")
-                    break
-                    
-                if msvcrt.kbhit():
-                    key = msvcrt.getch()
-                    # 检查Ctrl+R组合键 (Ctrl+R对应的ASCII码是18)
-                    if ord(key) == 18:  # Ctrl+R
+            if os.name == 'nt':
+                reader = get_console_key_reader()
+                # 最多等待30秒，超时自动退出
+                deadline = time.monotonic() + 30
+                while True:
+                    key = reader.read_key(timeout=deadline - time.monotonic())
+                    if key is None:
+                        logger.info("超时自动退出")
+                        break
+                    # 检查Ctrl+R组合键
+                    if key == CTRL_R:
                         restart_requested = True
                         restart_program()
                         break
                     # 检查回车键
-                    elif ord(key) == 13:  # Enter
+                    elif key == ENTER:
                         break
-                time.sleep(0.05)  # 减少延迟以提高响应性
-        except ImportError:
-            # 非Windows系统
-            input("按回车键退出...")
+            else:
+                # 非Windows系统
+                input("按回车键退出...")
         except Exception as e:
             logger.warning(f"异常处理中的键盘监听出现错误: {e}")
     finally:
+        # 唤醒并结束键盘监听线程
+        if console_key_reader is not None:
+            console_key_reader.stop()
         # 清理实例文件
         cleanup_instance_file(instance_file)
     
     if restart_requested:
         logger.info("Kaos 正在重启...")
-        # 重新启动程序
-        python = sys.executable
-        os.execl(python, python, *sys.argv)
+        do_restart(instance_file)
     else:
         logger.info("Kaos 已退出")
\ No newline at end of file
@@ -1,42 +1,432 @@
 import os
+import re
 import json
+import gzip
+import queue
 import threading
 import time
+import traceback
+from collections import deque
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional, Dict, Any
 
+from src.config_manager import get_config_manager
+from src.logger import get_logger
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = get_logger()
+
+# Copilot浮窗UI资源（模块导入时创建一次，所有实例共享）
+_COPILOT_CSS = '''
+/* Copilot AI助手悬浮窗样式 */
+.copilot-float-btn {
+    position: fixed;
+    bottom: 30px;
+    right: 30px;
+    width: 60px;
+    height: 60px;
+    border-radius: 50%;
+    background: linear-gradient(135deg, #3498db, #8e44ad);
+    color: white;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    cursor: pointer;
+    box-shadow: 0 4px 20px rgba(0,0,0,0.3);
+    z-index: 1000;
+    transition: all 0.3s ease;
+    font-size: 24px;
+}
+
+.copilot-float-icon {
+    width: 1em;
+    height: 1em;
+}
+
+.copilot-float-btn:hover {
+    transform: scale(1.1);
+    box-shadow: 0 6px 25px rgba(0,0,0,0.4);
+}
+
+.copilot-container {
+    position: fixed;
+    bottom: 100px;
+    right: 30px;
+    width: 400px;
+    height: 500px;
+    background: rgba(255, 255, 255, 0.95);
+    backdrop-filter: blur(10px);
+    -webkit-backdrop-filter: blur(10px);
+    border-radius: 20px;
+    box-shadow: 0 10px 30px rgba(0,0,0,0.2);
+    z-index: 1000;
+    display: none;
+    flex-direction: column;
+    overflow: hidden;
+    border: 1px solid rgba(255, 255, 255, 0.3);
+}
+
+.copilot-header {
+    padding: 20px;
+    background: linear-gradient(135deg, #3498db, #8e44ad);
+    color: white;
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+}
+
+.copilot-title {
+    font-size: 1.2rem;
+    font-weight: 600;
+}
+
+.copilot-close {
+    background: none;
+    border: none;
+    color: white;
+    font-size: 1.5rem;
+    cursor: pointer;
+    width: 30px;
+    height: 30px;
+    display: flex;
+    align-items: center;
+    justify-content: center;
+    border-radius: 50%;
+    transition: background 0.3s ease;
+}
+
+.copilot-close:hover {
+    background: rgba(255, 255, 255, 0.2);
+}
+
+.copilot-messages {
+    flex: 1;
+    padding: 20px;
+    overflow-y: auto;
+    display: flex;
+    flex-direction: column;
+}
+
+.copilot-message {
+    max-width: 80%;
+    padding: 12px 16px;
+    margin-bottom: 15px;
+    border-radius: 18px;
+    word-wrap: break-word;
+    animation: fadeIn 0.3s ease;
+}
+
+.copilot-user-message {
+    align-self: flex-end;
+    background: linear-gradient(135deg, #3498db, #2980b9);
+    color: white;
+}
+
+.copilot-ai-message {
+    align-self: flex-start;
+    background: rgba(241, 241, 241, 0.9);
+    color: #333;
+}
+
+.copilot-input-container {
+    padding: 20px;
+    border-top: 1px solid rgba(0, 0, 0, 0.1);
+    display: flex;
+}
+
+.copilot-input {
+    flex: 1;
+    padding: 12px 15px;
+    border: 1px solid #ddd;
+    border-radius: 25px;
+    outline: none;
+    font-size: 1rem;
+    background: rgba(255, 255, 255, 0.8);
+}
+
+.copilot-send-btn {
+    margin-left: 10px;
+    padding: 12px 20px;
+    background: linear-gradient(135deg, #3498db, #8e44ad);
+    color: white;
+    border: none;
+    border-radius: 25px;
+    cursor: pointer;
+    font-weight: 600;
+    transition: transform 0.2s ease;
+}
+
+.copilot-send-btn:hover {
+    transform: translateY(-2px);
+}
+
+.copilot-send-btn:active {
+    transform: translateY(0);
+}
+
+@keyframes fadeIn {
+    from { opacity: 0; transform: translateY(10px); }
+    to { opacity: 1; transform: translateY(0); }
+}
+
+/* 添加打字效果 */
+.copilot-typing-indicator {
+    align-self: flex-start;
+    background: rgba(241, 241, 241, 0.9);
+    color: #333;
+    padding: 12px 16px;
+    border-radius: 18px;
+    margin-bottom: 15px;
+    display: flex;
+    align-items: center;
+}
+
+.typing-dot {
+    width: 8px;
+    height: 8px;
+    background-color: #999;
+    border-radius: 50%;
+    margin: 0 2px;
+    animation: typing 1.4s infinite ease-in-out;
+}
+
+.typing-dot:nth-child(1) { animation-delay: 0s; }
+.typing-dot:nth-child(2) { animation-delay: 0.2s; }
+.typing-dot:nth-child(3) { animation-delay: 0.4s; }
+
+@keyframes typing {
+    0%, 60%, 100% { transform: translateY(0); }
+    30% { transform: translateY(-5px); }
+}
+'''
+
+# Copilot HTML内容（包含工具调用确认弹窗）
+_COPILOT_HTML = '''
+<!-- Copilot AI助手悬浮窗 -->
+<div class="copilot-float-btn" id="copilotFloatBtn">
+    <svg class="copilot-float-icon" viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="2"
+         stroke-linecap="round" stroke-linejoin="round" aria-hidden="true">
+        <rect x="4" y="8" width="16" height="12" rx="2"/><circle cx="12" cy="3" r="1"/>
+        <path d="M12 4v4M9 13h.01M15 13h.01M9 17h6"/>
+    </svg>
+</div>
+<div class="copilot-container" id="copilotContainer">
+    <div class="copilot-header">
+        <div class="copilot-title">Copilot AI助手</div>
+        <button class="copilot-close" id="copilotClose">&times;</button>
+    </div>
+    <div class="copilot-messages" id="copilotMessages">
+        <div class="copilot-message copilot-ai-message">
+            您好！我是Copilot AI助手，有什么我可以帮您的吗？
+        </div>
+    </div>
+    <div class="copilot-input-container">
+        <input type="text" class="copilot-input" id="copilotInput" placeholder="输入您的问题...">
+        <button class="copilot-send-btn" id="copilotSend">发送</button>
+    </div>
+</div>
+<!-- 工具调用确认弹窗 -->
+<div class="copilot-tool-confirm" id="copilotToolConfirm" style="display:none;position:fixed;bottom:160px;right:50px;width:320px;background:#fff;border-radius:12px;box-shadow:0 2px 12px rgba(0,0,0,0.18);z-index:2000;padding:24px;">
+    <div style="font-weight:bold;font-size:16px;margin-bottom:12px;">工具调用请求</div>
+    <div id="copilotToolConfirmMsg" style="margin-bottom:18px;">是否允许Copilot执行工具命令？</div>
+    <button id="copilotToolAllow" style="margin-right:16px;padding:8px 18px;border-radius:6px;background:#3498db;color:#fff;border:none;">允许</button>
+    <button id="copilotToolDeny" style="padding:8px 18px;border-radius:6px;background:#eee;color:#333;border:none;">拒绝</button>
+</div>
+'''
+
+_COPILOT_JS = '''
+// Copilot AI助手功能
+(function() {
+    const floatBtn = document.getElementById('copilotFloatBtn');
+    const container = document.getElementById('copilotContainer');
+    const closeBtn = document.getElementById('copilotClose');
+    const input = document.getElementById('copilotInput');
+    const sendBtn = document.getElementById('copilotSend');
+    const messages = document.getElementById('copilotMessages');
+    const toolConfirm = document.getElementById('copilotToolConfirm');
+    const toolAllow = document.getElementById('copilotToolAllow');
+    const toolDeny = document.getElementById('copilotToolDeny');
+    const toolConfirmMsg = document.getElementById('copilotToolConfirmMsg');
+
+    let pendingTool = null;
+
+    // 切换悬浮窗显示/隐藏
+    floatBtn.addEventListener('click', function() {
+        container.style.display = container.style.display === 'flex' ? 'none' : 'flex';
+    });
+
+    // 关闭悬浮窗
+    closeBtn.addEventListener('click', function() {
+        container.style.display = 'none';
+    });
+
+    // 发送消息
+    function sendMessage() {
+        const message = input.value.trim();
+        if (message) {
+            addMessage(message, 'user');
+            input.value = '';
+            const typingIndicator = addTypingIndicator();
+            fetch('/api/copilot/chat', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({message: message})
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (typingIndicator && typingIndicator.parentNode) {
+                    typingIndicator.parentNode.removeChild(typingIndicator);
+                }
+                // 工具调用请求
+                if (data.tool_request) {
+                    pendingTool = data.tool_request;
+                    toolConfirmMsg.textContent = data.tool_request.confirm_msg || '是否允许Copilot执行工具命令？';
+                    toolConfirm.style.display = 'block';
+                } else {
+                    // 普通AI回复
+                    if (data.response) {
+                        addMessage(data.response, 'ai');
+                    } else if (data.error) {
+                        addMessage('抱歉，处理您的请求时出现了错误: ' + data.error, 'ai');
+                    }
+                }
+            })
+            .catch(error => {
+                if (typingIndicator && typingIndicator.parentNode) {
+                    typingIndicator.parentNode.removeChild(typingIndicator);
+                }
+                addMessage('抱歉，无法连接到AI服务: ' + error.message, 'ai');
+            });
+        }
+    }
+
+    // 工具调用确认弹窗交互
+    toolAllow.addEventListener('click', function() {
+        if (pendingTool) {
+            toolConfirm.style.display = 'none';
+            // 发送工具命令到后端
+            fetch('/api/copilot/tool', {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(pendingTool)
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.success) {
+                    addMessage('[工具执行结果]\n' + data.output, 'ai');
+                } else {
+                    addMessage('[工具执行失败]\n' + data.error, 'ai');
+                }
+            });
+            pendingTool = null;
+        }
+    });
+    toolDeny.addEventListener('click', function() {
+        toolConfirm.style.display = 'none';
+        addMessage('已拒绝工具命令执行。', 'ai');
+        pendingTool = null;
+    });
+
+    // 添加消息到聊天窗口
+    function addMessage(text, sender) {
+        const messageDiv = document.createElement('div');
+        messageDiv.classList.add('copilot-message');
+        messageDiv.classList.add(sender === 'user' ? 'copilot-user-message' : 'copilot-ai-message');
+        messageDiv.textContent = text;
+        messages.appendChild(messageDiv);
+        messages.scrollTop = messages.scrollHeight;
+    }
+    // 添加打字指示器
+    function addTypingIndicator() {
+        const typingDiv = document.createElement('div');
+        typingDiv.className = 'copilot-typing-indicator';
+        typingDiv.innerHTML = `
+            <div class="typing-dot"></div>
+            <div class="typing-dot"></div>
+            <div class="typing-dot"></div>
+        `;
+        messages.appendChild(typingDiv);
+        messages.scrollTop = messages.scrollHeight;
+        return typingDiv;
+    }
+
+    // 发送按钮点击事件
+    sendBtn.addEventListener('click', sendMessage);
+
+    // 回车发送消息
+    input.addEventListener('keypress', function(e) {
+        if (e.key === 'Enter') {
+            sendMessage();
+        }
+    });
+})();
+'''
+
+def _precompress(text):
+    """
+    将UI资源编码为UTF-8并预先压缩，Web服务器无需在每次请求时压缩
+    :param text: 资源文本
+    :return: (原始字节, {编码名: 压缩后的字节})
+    """
+    data = text.encode('utf-8')
+    encodings = {'gzip': gzip.compress(data, compresslevel=9)}
+    if brotli is not None:
+        encodings['br'] = brotli.compress(data, quality=11)
+    return data, encodings
+
+# CSS和JS作为静态资源单独提供，页面中只引用其URL
+# 对话历史中逐字保留的最大消息数，超出后较早的一半会被折叠进摘要
+MAX_HISTORY_MESSAGES = 20
+# 摘要持续失败时对话历史保留的消息数上限，超出后直接丢弃最早的消息
+MAX_RETAINED_MESSAGES = MAX_HISTORY_MESSAGES * 2
+# 摘要失败后的重试等待时间（秒），每次连续失败翻倍，不超过上限
+SUMMARY_RETRY_DELAY = 30
+SUMMARY_RETRY_MAX_DELAY = 600
+SUMMARY_PROMPT = "请用简洁的中文总结以下对话的要点，保留后续对话可能用到的事实和上下文："
+
+_COPILOT_CSS_PATH = '/static/copilot/copilot.css'
+_COPILOT_JS_PATH = '/static/copilot/copilot.js'
+_COPILOT_CSS_BYTES, _COPILOT_CSS_ENCODINGS = _precompress(_COPILOT_CSS)
+_COPILOT_JS_BYTES, _COPILOT_JS_ENCODINGS = _precompress(_COPILOT_JS)
+
+def _log_exception(message):
+    """记录错误日志，仅在DEBUG级别启用时才格式化并记录堆栈信息"""
+    logger.error(message, plugin_name=PLUGIN_NAME)
+    if logger.is_enabled_for('DEBUG'):
+        logger.debug(traceback.format_exc(), plugin_name=PLUGIN_NAME)
+
+def _is_ui_enabled():
+    """
+    判断是否需要向Web平台注册浮窗UI（无界面部署时可关闭）
+    环境变量COPILOT_ENABLE_UI优先，其次为全局配置copilot.enable_ui，默认开启
+    """
+    env_value = os.environ.get("COPILOT_ENABLE_UI")
+    if env_value is not None:
+        return env_value.strip().lower() not in ("0", "false", "no", "off")
+    return bool(get_config_manager().get("copilot.enable_ui", True))
+
+@lru_cache(maxsize=32)
+def _thought_chain_pattern(start_marker, end_marker):
+    """编译并缓存提取思维链区间的正则表达式"""
+    return re.compile(re.escape(start_marker) + r"(.*?)" + re.escape(end_marker), re.DOTALL)
+
 class CopilotPlugin:
-    def _register_ui_content(self):
-        """直接注入Copilot浮窗UI内容到WebPlatform插件（不依赖API注册表）"""
-        copilot_css = '''
-        /* Copilot AI助手悬浮窗样式 */
-        ...existing code...
-        '''
-        copilot_html = '''
-        <!-- Copilot AI助手悬浮窗 -->
-        ...existing code...
-        '''
-        copilot_js = '''
-        ...existing code...
-        '''
-        try:
-            import sys
-            web_module = sys.modules.get('plugins.WebPlatform.plugin')
-            if web_module and hasattr(web_module, 'WebInterfaceHandler'):
-                handler = getattr(web_module, 'WebInterfaceHandler')
-                handler.register_plugin_content("Copilot", "css", copilot_css, "head")
-                handler.register_plugin_content("Copilot", "html", copilot_html, "body")
-                handler.register_plugin_content("Copilot", "js", copilot_js, "body")
-                self.ui_registered = True
-                print("Copilot浮窗UI已直接注入WebPlatform")
-                return True
-            else:
-                print("未找到WebPlatform插件模块或Handler，无法注入UI内容")
-        except Exception as e:
-            print(f"注册UI内容时发生未预期错误: {e}")
-            import traceback
-            traceback.print_exc()
-        return False
+    # 实例属性固定，使用__slots__省去每个实例的__dict__
+    __slots__ = (
+        "name", "version", "developer", "description", "api_registry", "config_path",
+        "is_registered", "is_started", "ai_manager", "conversation_history",
+        "history_summary", "_folded_turns", "_summarizing", "_summary_failures", "_summary_retry_at",
+        "_summary_lock", "ui_registered",
+        "enable_ui"
+    )
+    
     def call_tool_command(self, command: str, timeout: int = 30) -> dict:
         """
         通过系统API调用工具命令（如模型推理/脚本），返回执行结果。
@@ -66,9 +456,21 @@ class CopilotPlugin:
         self.is_registered = False
         self.is_started = False
         self.ai_manager = None
-        self.conversation_history = []
-        self.pending_requests = {}
+        # 对话历史使用有界deque，折叠时从左端O(1)弹出、摘要失败时从左端放回；
+        # maxlen是摘要持续失败时的硬上限，追加新对话时丢弃最早的消息
+        self.conversation_history = deque(maxlen=MAX_RETAINED_MESSAGES)
+        # 较早对话的摘要，随请求作为system消息发送
+        self.history_summary = ""
+        # 已移出历史、等待合并进摘要的对话，以及是否有摘要线程在运行
+        self._folded_turns = []
+        self._summarizing = False
+        # 连续摘要失败次数，以及退避结束前不再发起摘要的时间点（time.monotonic）
+        self._summary_failures = 0
+        self._summary_retry_at = 0.0
+        # 保护对话历史、待摘要对话和摘要的读写（不在网络请求期间持有）
+        self._summary_lock = threading.Lock()
         self.ui_registered = False
+        self.enable_ui = _is_ui_enabled()
         
     def get_manifest(self):
         """获取插件清单信息"""
@@ -90,88 +492,154 @@ class CopilotPlugin:
                     show_output=False
                 )
                 self.is_registered = True
-                print("[Copilot] API注册成功")
+                logger.info("API注册成功", plugin_name=PLUGIN_NAME)
                 return True
         except Exception as e:
             error_msg = f"注册API时出错: {e}"
-            print(f"[Copilot] {error_msg}")
-            import traceback
-            traceback.print_exc()
+            _log_exception(error_msg)
         return False
             
     # 菜单注册相关方法已移除
         
-    def _ai_message_handler(self, message_type, data):
-        """处理AI消息"""
-        try:
-            if message_type == "ai_response":
-                request_id = data.get("request_id")
-                if request_id in self.pending_requests:
-                    # 存储响应数据
-                    self.pending_requests[request_id]["response"] = data
-                    # 通知等待的线程
-                    if "event" in self.pending_requests[request_id]:
-                        self.pending_requests[request_id]["event"].set()
-        except Exception as e:
-            print(f"处理AI消息时出错: {e}")
-
-    def _handle_chat_request(self, message, model_name="G3"):
+    def _handle_chat_request(self, message, model_name="G3", no_cache=False):
         """处理聊天请求"""
         try:
-            # 添加用户消息到对话历史
-            self.conversation_history.append({
-                "role": "user",
-                "content": message
-            })
-            
-            # 发送请求到AI管理器
-            if self.ai_manager:
-                request_id = self.ai_manager.send_request(
-                    model_name=model_name,
-                    messages=self.conversation_history
-                )
-                
-                # 创建等待事件
-                import threading
-                event = threading.Event()
-                self.pending_requests[request_id] = {
-                    "event": event,
-                    "response": None
-                }
-                
-                # 等待响应（最多30秒）
-                if event.wait(timeout=30):
-                    response_data = self.pending_requests[request_id]["response"]
-                    # 清理等待记录
-                    del self.pending_requests[request_id]
-                    
-                    if "error" in response_data:
-                        return {"error": response_data["error"]}
-                    
-                    # 添加AI回复到对话历史
-                    ai_response = response_data["response"]
-                    if "content" in ai_response:
-                        self.conversation_history.append({
-                            "role": "assistant",
-                            "content": ai_response["content"]
-                        })
-                        return {"response": ai_response["content"]}
-                    else:
-                        return {"error": "AI响应格式错误"}
-                else:
-                    # 超时处理
-                    if request_id in self.pending_requests:
-                        del self.pending_requests[request_id]
-                    return {"error": "请求超时"}
-            else:
+            if not self.ai_manager:
                 return {"error": "AI管理器未初始化"}
+            return self._request_ai_response(message, model_name, no_cache)
         except Exception as e:
             error_msg = f"处理聊天请求时出错: {e}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            _log_exception(error_msg)
             return {"error": str(e)}
 
+    def _request_ai_response(self, message, model_name, no_cache=False):
+        """
+        发送一轮对话并等待AI响应
+        :param message: 用户消息
+        :param model_name: 模型名称
+        :param no_cache: 为True时跳过AI管理器的响应缓存，总是请求模型
+        :return: {"response": 内容} 或 {"error": 错误信息}
+        """
+        # 用户消息在收到回复后才与回复一起写入对话历史，失败的轮次不会留下半对消息
+        user_turn = {"role": "user", "content": message}
+        messages = self._compose_messages(user_turn)
+        
+        response_data = self._send_and_wait(messages, model_name, use_cache=not no_cache)
+        if response_data is None:
+            return {"error": "请求超时"}
+        if "error" in response_data:
+            return {"error": response_data["error"]}
+        
+        ai_response = response_data["response"]
+        if "content" not in ai_response:
+            return {"error": "AI响应格式错误"}
+        content = ai_response["content"]
+        
+        # 将本轮的用户消息和AI回复一次性加入对话历史
+        assistant_turn = {"role": "assistant", "content": content}
+        with self._summary_lock:
+            self.conversation_history.extend((user_turn, assistant_turn))
+            if len(self.conversation_history) >= MAX_HISTORY_MESSAGES:
+                self._fold_history(model_name)
+        return {"response": content}
+
+    def _send_and_wait(self, messages, model_name, timeout=30, use_cache=True):
+        """
+        发送一次AI请求并等待响应
+        :param messages: 发送给模型的消息列表
+        :param model_name: 模型名称
+        :param timeout: 等待超时时间（秒）
+        :param use_cache: 是否使用AI管理器的响应缓存
+        :return: AI管理器的响应数据，超时返回None
+        """
+        # 每个请求对应一个SimpleQueue，AI管理器通过该请求的回调直接投递响应，
+        # 无需按请求ID查找等待记录
+        waiter = queue.SimpleQueue()
+        self.ai_manager.send_request(
+            model_name=model_name,
+            messages=messages,
+            callback=waiter.put_nowait,
+            use_cache=use_cache
+        )
+        try:
+            return waiter.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _compose_messages(self, user_turn):
+        """
+        组装发送给模型的消息：较早对话的摘要 + 最近的对话 + 本轮用户消息
+        :param user_turn: 本轮的用户消息
+        :return: 消息列表
+        """
+        messages = []
+        with self._summary_lock:
+            if self.history_summary:
+                messages.append({
+                    "role": "system",
+                    "content": f"以下是之前对话的摘要：\n{self.history_summary}"
+                })
+            # 正在摘要的对话尚未体现在摘要中，仍原样发送
+            messages.extend(self._folded_turns)
+            messages.extend(self.conversation_history)
+        messages.append(user_turn)
+        return messages
+
+    def _fold_history(self, model_name):
+        """将较早的一半对话移出历史，交给后台摘要线程合并进摘要（调用方需持有_summary_lock）"""
+        if self._summarizing or time.monotonic() < self._summary_retry_at:
+            # 摘要进行中或失败退避期间不再移出对话，历史由maxlen限制
+            return
+        half = len(self.conversation_history) // 2
+        # 保持用户/助手消息成对，折叠的消息数取偶数
+        half -= half % 2
+        popleft = self.conversation_history.popleft
+        self._folded_turns = [popleft() for _ in range(half)]
+        self._summarizing = True
+        threading.Thread(
+            target=self._summarize_turns,
+            args=(model_name,),
+            daemon=True
+        ).start()
+
+    def _summarize_turns(self, model_name):
+        """请求模型把已有摘要和被移出的对话合并为新的摘要，失败时把对话放回历史并退避"""
+        with self._summary_lock:
+            old_turns = self._folded_turns
+            summary = self.history_summary
+        lines = []
+        if summary:
+            lines.append(f"[已有摘要] {summary}")
+        lines.extend(f"[{turn['role']}] {turn['content']}" for turn in old_turns)
+        messages = [{
+            "role": "user",
+            "content": SUMMARY_PROMPT + "\n" + "\n".join(lines)
+        }]
+        content = None
+        try:
+            response_data = self._send_and_wait(messages, model_name)
+            if response_data and "error" not in response_data:
+                content = response_data["response"].get("content")
+        except Exception as e:
+            logger.warning(f"生成对话摘要时出错: {e}", plugin_name=PLUGIN_NAME)
+        with self._summary_lock:
+            self._folded_turns = []
+            self._summarizing = False
+            if content:
+                self.history_summary = content.strip()
+                self._summary_failures = 0
+                return
+            # 摘要失败：在历史剩余容量内按原顺序把最新的待摘要对话放回左端，
+            # 更早的直接丢弃，放回时不会挤掉最新的对话
+            room = MAX_RETAINED_MESSAGES - len(self.conversation_history)
+            room -= room % 2
+            if room > 0:
+                self.conversation_history.extendleft(reversed(old_turns[-room:]))
+            self._summary_failures += 1
+            delay = min(SUMMARY_RETRY_DELAY << (self._summary_failures - 1), SUMMARY_RETRY_MAX_DELAY)
+            self._summary_retry_at = time.monotonic() + delay
+        logger.warning(f"对话摘要生成失败，已将对话放回历史，{delay}秒后重试", plugin_name=PLUGIN_NAME)
+
     def truncate_thought_chain(self, text, start_marker="<think>", end_marker="</think>"):
         """
         截断思维链文本，提取 <think> ... </think> 区间内容。
@@ -183,512 +651,109 @@ class CopilotPlugin:
             str: 截取后的内容，若无则返回空字符串。
         """
         try:
-            start = text.find(start_marker)
-            if start == -1:
-                return ""
-            start += len(start_marker)
-            end = text.find(end_marker, start)
-            if end == -1:
-                return ""
-            return text[start:end].strip()
+            # 单次正则扫描同时定位起始和结束标记
+            match = _thought_chain_pattern(start_marker, end_marker).search(text)
+            return match.group(1).strip() if match else ""
         except Exception as e:
-            print(f"截断思维链时出错: {e}")
-            import traceback
-            traceback.print_exc()
+            _log_exception(f"截断思维链时出错: {e}")
             return ""
     
     def start(self):
         """启动插件"""
         if self.is_started:
-            print("插件已启动，无需重复启动")
+            logger.info("插件已启动，无需重复启动", plugin_name=PLUGIN_NAME)
             return True
             
         try:
-            print("正在启动Copilot插件...")
+            logger.info("正在启动Copilot插件...", plugin_name=PLUGIN_NAME)
             # 注册API
             if not self.register_apis():
-                print("警告: API注册失败，插件功能可能受限")
+                logger.warning("API注册失败，插件功能可能受限", plugin_name=PLUGIN_NAME)
             # 初始化AI管理器
             try:
-                from src.ai_api import get_ai_manager, register_ai_message_listener
+                from src.ai_api import get_ai_manager
                 # 如果配置文件存在，传递配置文件路径给AI管理器
                 if self.config_path and os.path.exists(self.config_path):
                     self.ai_manager = get_ai_manager(self.config_path)
-                    print(f"使用配置文件: {self.config_path}")
+                    # 管理器已由其他调用方以不同配置创建时，显式重新加载本插件的配置
+                    if self.ai_manager.config_path != self.config_path:
+                        self.ai_manager.reload_config(self.config_path)
+                    logger.info(f"使用配置文件: {self.config_path}", plugin_name=PLUGIN_NAME)
                 else:
                     self.ai_manager = get_ai_manager()
-                # 注册消息监听器
-                register_ai_message_listener(self._ai_message_handler)
-                print("AI管理器初始化成功")
+                logger.info("AI管理器初始化成功", plugin_name=PLUGIN_NAME)
             except ImportError as e:
-                print(f"警告: 无法导入AI管理器模块: {e}")
+                logger.warning(f"无法导入AI管理器模块: {e}", plugin_name=PLUGIN_NAME)
             except Exception as e:
-                print(f"警告: 无法初始化AI管理器: {e}")
-                import traceback
-                traceback.print_exc()
+                _log_exception(f"无法初始化AI管理器: {e}")
             # 注册UI内容到Web平台
             self._register_ui_content()
         except Exception as e:
-            print(f"Copilot启动异常: {e}")
-            import traceback
-            traceback.print_exc()
+            _log_exception(f"Copilot启动异常: {e}")
         return True
 
-    def _register_ui_content(self):
-        """直接注入Copilot浮窗UI内容到WebPlatform插件（不依赖API注册表）"""
-        copilot_css = '''
-        /* Copilot AI助手悬浮窗样式 */
-        ...existing code...
-        '''
-        copilot_html = '''
-        <!-- Copilot AI助手悬浮窗 -->
-        ...existing code...
-        '''
-        copilot_js = '''
-        ...existing code...
-        '''
-        try:
-            import sys
-            web_module = sys.modules.get('plugins.WebPlatform.plugin')
-            if web_module and hasattr(web_module, 'WebInterfaceHandler'):
-                handler = getattr(web_module, 'WebInterfaceHandler')
-                handler.register_plugin_content("Copilot", "css", copilot_css, "head")
-                handler.register_plugin_content("Copilot", "html", copilot_html, "body")
-                handler.register_plugin_content("Copilot", "js", copilot_js, "body")
-                self.ui_registered = True
-                print("Copilot浮窗UI已直接注入WebPlatform")
-                return True
-            else:
-                print("未找到WebPlatform插件模块或Handler，无法注入UI内容")
-        except Exception as e:
-            print(f"Copilot UI注入WebPlatform失败: {e}")
-            import traceback
-            traceback.print_exc()
-        return False
-        
     def _register_ui_content(self):
         """注册UI内容到Web平台（仅浮窗UI，无菜单）"""
+        if not self.enable_ui:
+            return False
         try:
             if not self.api_registry:
-                print("警告: API注册表不可用，无法注册UI内容")
+                logger.warning("API注册表不可用，无法注册UI内容", plugin_name=PLUGIN_NAME)
                 return False
 
-            # 注册Copilot CSS样式
-            copilot_css = '''
-            /* Copilot AI助手悬浮窗样式 */
-            .copilot-float-btn {
-                position: fixed;
-                bottom: 30px;
-                right: 30px;
-                width: 60px;
-                height: 60px;
-                border-radius: 50%;
-                background: linear-gradient(135deg, #3498db, #8e44ad);
-                color: white;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                cursor: pointer;
-                box-shadow: 0 4px 20px rgba(0,0,0,0.3);
-                z-index: 1000;
-                transition: all 0.3s ease;
-                font-size: 24px;
-            }
-            
-            .copilot-float-btn:hover {
-                transform: scale(1.1);
-                box-shadow: 0 6px 25px rgba(0,0,0,0.4);
-            }
-            
-            .copilot-container {
-                position: fixed;
-                bottom: 100px;
-                right: 30px;
-                width: 400px;
-                height: 500px;
-                background: rgba(255, 255, 255, 0.95);
-                backdrop-filter: blur(10px);
-                -webkit-backdrop-filter: blur(10px);
-                border-radius: 20px;
-                box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-                z-index: 1000;
-                display: none;
-                flex-direction: column;
-                overflow: hidden;
-                border: 1px solid rgba(255, 255, 255, 0.3);
-            }
-            
-            .copilot-header {
-                padding: 20px;
-                background: linear-gradient(135deg, #3498db, #8e44ad);
-                color: white;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }
-            
-            .copilot-title {
-                font-size: 1.2rem;
-                font-weight: 600;
-            }
-            
-            .copilot-close {
-                background: none;
-                border: none;
-                color: white;
-                font-size: 1.5rem;
-                cursor: pointer;
-                width: 30px;
-                height: 30px;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                border-radius: 50%;
-                transition: background 0.3s ease;
-            }
-            
-            .copilot-close:hover {
-                background: rgba(255, 255, 255, 0.2);
-            }
-            
-            .copilot-messages {
-                flex: 1;
-                padding: 20px;
-                overflow-y: auto;
-                display: flex;
-                flex-direction: column;
-            }
-            
-            .copilot-message {
-                max-width: 80%;
-                padding: 12px 16px;
-                margin-bottom: 15px;
-                border-radius: 18px;
-                word-wrap: break-word;
-                animation: fadeIn 0.3s ease;
-            }
-            
-            .copilot-user-message {
-                align-self: flex-end;
-                background: linear-gradient(135deg, #3498db, #2980b9);
-                color: white;
-            }
-            
-            .copilot-ai-message {
-                align-self: flex-start;
-                background: rgba(241, 241, 241, 0.9);
-                color: #333;
-            }
-            
-            .copilot-input-container {
-                padding: 20px;
-                border-top: 1px solid rgba(0, 0, 0, 0.1);
-                display: flex;
-            }
-            
-            .copilot-input {
-                flex: 1;
-                padding: 12px 15px;
-                border: 1px solid #ddd;
-                border-radius: 25px;
-                outline: none;
-                font-size: 1rem;
-                background: rgba(255, 255, 255, 0.8);
-            }
-            
-            .copilot-send-btn {
-                margin-left: 10px;
-                padding: 12px 20px;
-                background: linear-gradient(135deg, #3498db, #8e44ad);
-                color: white;
-                border: none;
-                border-radius: 25px;
-                cursor: pointer;
-                font-weight: 600;
-                transition: transform 0.2s ease;
-            }
-            
-            .copilot-send-btn:hover {
-                transform: translateY(-2px);
-            }
-            
-            .copilot-send-btn:active {
-                transform: translateY(0);
-            }
-            
-            @keyframes fadeIn {
-                from { opacity: 0; transform: translateY(10px); }
-                to { opacity: 1; transform: translateY(0); }
-            }
-            
-            /* 添加打字效果 */
-            .copilot-typing-indicator {
-                align-self: flex-start;
-                background: rgba(241, 241, 241, 0.9);
-                color: #333;
-                padding: 12px 16px;
-                border-radius: 18px;
-                margin-bottom: 15px;
-                display: flex;
-                align-items: center;
-            }
-            
-            .typing-dot {
-                width: 8px;
-                height: 8px;
-                background-color: #999;
-                border-radius: 50%;
-                margin: 0 2px;
-                animation: typing 1.4s infinite ease-in-out;
-            }
-            
-            .typing-dot:nth-child(1) { animation-delay: 0s; }
-            .typing-dot:nth-child(2) { animation-delay: 0.2s; }
-            .typing-dot:nth-child(3) { animation-delay: 0.4s; }
-            
-            @keyframes typing {
-                0%, 60%, 100% { transform: translateY(0); }
-                30% { transform: translateY(-5px); }
-            }
-            '''
-            
-            # 注册Copilot HTML内容（增加工具调用确认弹窗）
-            copilot_html = '''
-            <!-- Copilot AI助手悬浮窗 -->
-            <div class="copilot-float-btn" id="copilotFloatBtn">
-                <i class="fas fa-robot"></i>
-            </div>
-            <div class="copilot-container" id="copilotContainer">
-                <div class="copilot-header">
-                    <div class="copilot-title">Copilot AI助手</div>
-                    <button class="copilot-close" id="copilotClose">&times;</button>
-                </div>
-                <div class="copilot-messages" id="copilotMessages">
-                    <div class="copilot-message copilot-ai-message">
-                        您好！我是Copilot AI助手，有什么我可以帮您的吗？
-                    </div>
-                </div>
-                <div class="copilot-input-container">
-                    <input type="text" class="copilot-input" id="copilotInput" placeholder="输入您的问题...">
-                    <button class="copilot-send-btn" id="copilotSend">发送</button>
-                </div>
-            </div>
-            <!-- 工具调用确认弹窗 -->
-            <div class="copilot-tool-confirm" id="copilotToolConfirm" style="display:none;position:fixed;bottom:160px;right:50px;width:320px;background:#fff;border-radius:12px;box-shadow:0 2px 12px rgba(0,0,0,0.18);z-index:2000;padding:24px;">
-                <div style="font-weight:bold;font-size:16px;margin-bottom:12px;">工具调用请求</div>
-                <div id="copilotToolConfirmMsg" style="margin-bottom:18px;">是否允许Copilot执行工具命令？</div>
-                <button id="copilotToolAllow" style="margin-right:16px;padding:8px 18px;border-radius:6px;background:#3498db;color:#fff;border:none;">允许</button>
-                <button id="copilotToolDeny" style="padding:8px 18px;border-radius:6px;background:#eee;color:#333;border:none;">拒绝</button>
-            </div>
-            '''
-            
-            copilot_js = '''
-            // Copilot AI助手功能
-            (function() {
-                const floatBtn = document.getElementById('copilotFloatBtn');
-                const container = document.getElementById('copilotContainer');
-                const closeBtn = document.getElementById('copilotClose');
-                const input = document.getElementById('copilotInput');
-                const sendBtn = document.getElementById('copilotSend');
-                const messages = document.getElementById('copilotMessages');
-                const toolConfirm = document.getElementById('copilotToolConfirm');
-                const toolAllow = document.getElementById('copilotToolAllow');
-                const toolDeny = document.getElementById('copilotToolDeny');
-                const toolConfirmMsg = document.getElementById('copilotToolConfirmMsg');
-
-                let pendingTool = null;
-
-                // 切换悬浮窗显示/隐藏
-                floatBtn.addEventListener('click', function() {
-                    container.style.display = container.style.display === 'flex' ? 'none' : 'flex';
-                });
-
-                // 关闭悬浮窗
-                closeBtn.addEventListener('click', function() {
-                    container.style.display = 'none';
-                });
-
-                // 发送消息
-                function sendMessage() {
-                    const message = input.value.trim();
-                    if (message) {
-                        addMessage(message, 'user');
-                        input.value = '';
-                        const typingIndicator = addTypingIndicator();
-                        fetch('/api/copilot/chat', {
-                            method: 'POST',
-                            headers: {
-                                'Content-Type': 'application/json'
-                            },
-                            body: JSON.stringify({message: message})
-                        })
-                        .then(response => response.json())
-                        .then(data => {
-                            if (typingIndicator && typingIndicator.parentNode) {
-                                typingIndicator.parentNode.removeChild(typingIndicator);
-                            }
-                            // 工具调用请求
-                            if (data.tool_request) {
-                                pendingTool = data.tool_request;
-                                toolConfirmMsg.textContent = data.tool_request.confirm_msg || '是否允许Copilot执行工具命令？';
-                                toolConfirm.style.display = 'block';
-                            } else {
-                                // 普通AI回复
-                                if (data.response) {
-                                    addMessage(data.response, 'ai');
-                                } else if (data.error) {
-                                    addMessage('抱歉，处理您的请求时出现了错误: ' + data.error, 'ai');
-                                }
-                            }
-                        })
-                        .catch(error => {
-                            if (typingIndicator && typingIndicator.parentNode) {
-                                typingIndicator.parentNode.removeChild(typingIndicator);
-                            }
-                            addMessage('抱歉，无法连接到AI服务: ' + error.message, 'ai');
-                        });
-                    }
-                }
-
-                // 工具调用确认弹窗交互
-                toolAllow.addEventListener('click', function() {
-                    if (pendingTool) {
-                        toolConfirm.style.display = 'none';
-                        // 发送工具命令到后端
-                        fetch('/api/copilot/tool', {
-                            method: 'POST',
-                            headers: {'Content-Type': 'application/json'},
-                            body: JSON.stringify(pendingTool)
-                        })
-                        .then(response => response.json())
-                        .then(data => {
-                            if (data.success) {
-                                addMessage('[工具执行结果]\n' + data.output, 'ai');
-                            } else {
-                                addMessage('[工具执行失败]\n' + data.error, 'ai');
-                            }
-                        });
-                        pendingTool = null;
-                    }
-                });
-                toolDeny.addEventListener('click', function() {
-                    toolConfirm.style.display = 'none';
-                    addMessage('已拒绝工具命令执行。', 'ai');
-                    pendingTool = null;
-                });
-
-                // 添加消息到聊天窗口
-                function addMessage(text, sender) {
-                    const messageDiv = document.createElement('div');
-                    messageDiv.classList.add('copilot-message');
-                    messageDiv.classList.add(sender === 'user' ? 'copilot-user-message' : 'copilot-ai-message');
-                    messageDiv.textContent = text;
-                    messages.appendChild(messageDiv);
-                    messages.scrollTop = messages.scrollHeight;
-                }
-                // 添加打字指示器
-                function addTypingIndicator() {
-                    const typingDiv = document.createElement('div');
-                    typingDiv.className = 'copilot-typing-indicator';
-                    typingDiv.innerHTML = `
-                        <div class="typing-dot"></div>
-                        <div class="typing-dot"></div>
-                        <div class="typing-dot"></div>
-                    `;
-                    messages.appendChild(typingDiv);
-                    messages.scrollTop = messages.scrollHeight;
-                    return typingDiv;
-                }
-                
-                // 发送按钮点击事件
-                sendBtn.addEventListener('click', sendMessage);
-                
-                // 回车发送消息
-                input.addEventListener('keypress', function(e) {
-                    if (e.key === 'Enter') {
-                        sendMessage();
-                    }
-                });
-            })();
-            '''
-            
             # 通过API系统注册内容到Web平台
             register_content_api = self.api_registry.get_api("WebPlatform", "register_plugin_content")
+            register_contents_api = self.api_registry.get_api("WebPlatform", "register_plugin_contents")
+            register_asset_api = self.api_registry.get_api("WebPlatform", "register_static_asset")
             if register_content_api is not None:
                 try:
-                    register_content_api("Copilot", "css", copilot_css, "head")
-                    register_content_api("Copilot", "html", copilot_html, "body")
-                    register_content_api("Copilot", "js", copilot_js, "body")
+                    if register_asset_api is not None:
+                        # CSS和JS以预压缩的静态资源提供，页面中只注入引用标签
+                        # URL带内容版本号，浏览器可长期缓存，内容变化时URL随之变化
+                        css_version = register_asset_api(_COPILOT_CSS_PATH, _COPILOT_CSS_BYTES, "text/css; charset=utf-8",
+                                                         precompressed=_COPILOT_CSS_ENCODINGS, immutable=True)
+                        js_version = register_asset_api(_COPILOT_JS_PATH, _COPILOT_JS_BYTES, "application/javascript; charset=utf-8",
+                                                        precompressed=_COPILOT_JS_ENCODINGS, immutable=True)
+                        contents = [
+                            ("html", f'<link rel="stylesheet" href="{_COPILOT_CSS_PATH}?v={css_version}">', "head"),
+                            ("html", _COPILOT_HTML, "body"),
+                            ("html", f'<script src="{_COPILOT_JS_PATH}?v={js_version}"></script>', "body"),
+                        ]
+                    else:
+                        # 旧版WebPlatform不支持静态资源时直接内联
+                        contents = [
+                            ("css", _COPILOT_CSS, "head"),
+                            ("html", _COPILOT_HTML, "body"),
+                            ("js", _COPILOT_JS, "body"),
+                        ]
+                    if register_contents_api is not None:
+                        # 一次调用注册全部内容
+                        register_contents_api("Copilot", contents)
+                    else:
+                        for content_type, content, position in contents:
+                            register_content_api("Copilot", content_type, content, position)
                     self.ui_registered = True
-                    print("UI内容已注册")
+                    logger.info("UI内容已注册", plugin_name=PLUGIN_NAME)
                     return True
                 except Exception as e:
-                    print(f"警告: 注册UI内容时出错: {e}")
-                    import traceback
-                    traceback.print_exc()
+                    _log_exception(f"注册UI内容时出错: {e}")
             else:
-                print("警告: 无法获取注册内容API，无法注册UI内容")
+                logger.warning("无法获取注册内容API，无法注册UI内容", plugin_name=PLUGIN_NAME)
         except Exception as e:
-            print(f"注册UI内容时发生未预期错误: {e}")
-            import traceback
-            traceback.print_exc()
+            _log_exception(f"注册UI内容时发生未预期错误: {e}")
         return False
         
     # 延迟注册UI相关方法已移除
 
     def stop(self):
         """停止插件"""
-        print("插件已停止")
+        logger.info("插件已停止", plugin_name=PLUGIN_NAME)
         
-    def send_ai_request(self, message, model_name="G3"):
+    def send_ai_request(self, message, model_name="G3", no_cache=False):
         """发送AI请求"""
         if not self.ai_manager:
             return {"error": "AI管理器未初始化"}
-        
-        # 添加用户消息到对话历史
-        self.conversation_history.append({
-            "role": "user",
-            "content": message
-        })
-        
-        # 发送请求
-        request_id = self.ai_manager.send_request(
-            model_name=model_name,
-            messages=self.conversation_history
-        )
-        
-        # 创建等待事件
-        import threading
-        event = threading.Event()
-        self.pending_requests[request_id] = {
-            "event": event,
-            "response": None
-        }
-        
-        # 等待响应（最多30秒）
-        if event.wait(timeout=30):
-            response_data = self.pending_requests[request_id]["response"]
-            # 清理等待记录
-            del self.pending_requests[request_id]
-            
-            if "error" in response_data:
-                return {"error": response_data["error"]}
-            
-            # 添加AI回复到对话历史
-            ai_response = response_data["response"]
-            if "content" in ai_response:
-                self.conversation_history.append({
-                    "role": "assistant",
-                    "content": ai_response["content"]
-                })
-                return {"response": ai_response["content"]}
-            else:
-                return {"error": "AI响应格式错误"}
-        else:
-            # 超时处理
-            if request_id in self.pending_requests:
-                del self.pending_requests[request_id]
-            return {"error": "请求超时"}
+        return self._request_ai_response(message, model_name, no_cache)
 
 def create_plugin(api_registry=None):
     """创建插件实例的工厂函数"""
@@ -697,9 +762,7 @@ def create_plugin(api_registry=None):
         return plugin_instance
     except Exception as e:
         error_msg = f"创建Copilot插件实例失败: {e}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
+        _log_exception(error_msg)
         # 创建一个空实例以防止崩溃
         class EmptyPlugin:
             def __init__(self, api_registry=None):
@@ -707,36 +770,34 @@ def create_plugin(api_registry=None):
                 self.version = "1.0.0"
                 
             def start(self):
-                print("插件启动失败")
+                logger.warning("插件启动失败", plugin_name=PLUGIN_NAME)
                 return False
                 
             def stop(self):
-                print("插件停止")
+                logger.info("插件停止", plugin_name=PLUGIN_NAME)
                 
         return EmptyPlugin()
 
 def start_plugin(api_registry, plugin_loader):
     """插件入口函数"""
     try:
-        print("正在创建Copilot插件实例...")
+        logger.info("正在创建Copilot插件实例...", plugin_name=PLUGIN_NAME)
         # 创建插件实例并启动
         plugin = create_plugin(api_registry)
         if not hasattr(plugin, 'start'):
-            print("错误: 创建的插件实例没有start方法")
+            logger.error("创建的插件实例没有start方法", plugin_name=PLUGIN_NAME)
             return False
             
-        print("Copilot插件实例创建成功，正在启动...")
+        logger.info("Copilot插件实例创建成功，正在启动...", plugin_name=PLUGIN_NAME)
         success = plugin.start()
         if success:
-            print("Copilot插件启动成功")
+            logger.info("Copilot插件启动成功", plugin_name=PLUGIN_NAME)
         else:
-            print("Copilot插件启动失败")
+            logger.warning("Copilot插件启动失败", plugin_name=PLUGIN_NAME)
         return success
     except Exception as e:
         error_msg = f"Copilot插件启动失败: {e}"
-        print(error_msg)
-        import traceback
-        traceback.print_exc()
+        _log_exception(error_msg)
         return False
 
 # 导出插件信息
@@ -1,225 +1,164 @@
 import os
+import gzip
+import email.utils
+import hashlib
+import html
+import mimetypes
+import string
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import json
 
-class WebInterfaceHandler(BaseHTTPRequestHandler):
-    # 存储注册的菜单项
-    registered_menu_items = []
-    # 存储注册的插件内容
-    registered_plugin_contents = []
-    
-    @classmethod
-    def register_menu_item(cls, name, icon, view, callback=None):
-        """注册菜单项到sidebar
-        :param name: 菜单项名称
-        :param icon: 图标类名 (Font Awesome)
-        :param view: 视图标识符
-        :param callback: 可选的回调函数
-        """
-        menu_item = {
-            'name': name,
-            'icon': icon,
-            'view': view,
-            'callback': callback
-        }
-        cls.registered_menu_items.append(menu_item)
-    
-    @classmethod
-    def register_plugin_content(cls, plugin_name, content_type, content, position="body"):
-        """注册插件内容到页面
-        :param plugin_name: 插件名称
-        :param content_type: 内容类型 ('html', 'css', 'js')
-        :param content: 内容字符串
-        :param position: 内容位置 ('head', 'body', 'footer')
-        """
-        plugin_content = {
-            'plugin_name': plugin_name,
-            'content_type': content_type,
-            'content': content,
-            'position': position
-        }
-        cls.registered_plugin_contents.append(plugin_content)
-    
-    def generate_menu_items(self):
-        """生成菜单项HTML"""
-        if not self.registered_menu_items:
-            return '<!-- 功能区已清空 -->'
-        
-        menu_html = ''
-        for i, item in enumerate(self.registered_menu_items):
-            menu_html += f'''
-            <div class="menu-item" data-view="{item['view']}" onclick="handleMenuItemClick('{item['view']}', event)">
-                <i class="fas fa-{item['icon']}"></i>
-                <span>{item['name']}</span>
-            </div>
-            '''
-        return menu_html
+from src.json_utils import json_dumps
 
-    def serve_image(self):
-        try:
-            # 处理logo文件夹中的图片
-            if self.path.startswith('/logo/'):
-                image_name = self.path[6:]  # 去掉'/logo/'前缀
-                image_path = os.path.join(os.path.dirname(__file__), '..', '..', 'logo', image_name)
-            else:
-                image_path = os.path.join(os.path.dirname(__file__), '..', '..', self.path[1:])
-            
-            with open(image_path, 'rb') as f:
-                image_data = f.read()
-            
-            self.send_response(200)
-            self.send_header('Content-type', 'image/png')
-            self.send_header('Content-Length', str(len(image_data)))
-            self.end_headers()
-            self.wfile.write(image_data)
-        except Exception as e:
-            self.send_error(404, "Image not found")
+try:
+    from src.api_registry import api_registry
+except ImportError:
+    # 插件被单独加载时没有全局API注册表，由插件加载器注入
+    api_registry = None
 
-    def serve_plugins_api(self):
-        plugins_info = self.get_plugins_info()
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
-        self.wfile.write(json.dumps(plugins_info, ensure_ascii=False).encode('utf-8'))
+# 图片信息缓存：路径 -> (修改时间, 大小, ETag, MIME类型)，内容由sendfile直接从文件发送
+_image_cache = {}
 
-    def get_plugins_info(self):
-        # 获取插件信息
-        plugins_info = []
-        if hasattr(self.server, 'plugin_loader'):
-            for plugin in self.server.plugin_loader.get_plugins():
-                manifest = plugin['manifest']
-                plugins_info.append({
-                    "name": manifest['pluginName'],
-                    "developer": manifest['Developer'],
-                    "version": manifest['version']
-                })
-        return plugins_info
+# logo目录及其中允许访问的图片（文件名 -> 绝对路径），只有列在其中的文件才会被返回
+_LOGO_DIR = os.path.realpath(os.path.join(os.path.dirname(__file__), '..', '..', 'logo'))
+_logo_files = {}
+_logo_dir_mtime = None
 
-    def get_plugin_contents_by_position(self, position, content_type):
-        """根据位置和类型获取插件内容"""
-        contents = []
-        for plugin_content in self.registered_plugin_contents:
-            if plugin_content['position'] == position and plugin_content['content_type'] == content_type:
-                contents.append(plugin_content['content'])
-        return '\n'.join(contents)
-    
-    def generate_plugin_cards(self, plugins_info):
-        """生成插件卡片的HTML"""
-        if not plugins_info:
-            return '<p>暂无插件</p>'
-        
-        cards_html = ''
-        for plugin in plugins_info:
-            cards_html += f'''
-                <div class="plugin-card">
-                    <div class="plugin-name">{plugin['name']}</div>
-                    <div class="plugin-developer"><i class="fas fa-user"></i> 开发者: {plugin['developer']}</div>
-                    <div class="plugin-version"><i class="fas fa-code-branch"></i> 版本: {plugin['version']}</div>
-                    <div class="plugin-description">这是一个强大的Kaos插件，提供丰富的功能和特性。</div>
-                </div>
-            '''
-        return cards_html
+def refresh_logo_files():
+    """logo目录有变化时重新扫描，支持运行期间新增的图片
+    :return: 文件名到绝对路径的映射
+    """
+    global _logo_files, _logo_dir_mtime
+    try:
+        mtime = os.stat(_LOGO_DIR).st_mtime_ns
+        if mtime != _logo_dir_mtime:
+            with os.scandir(_LOGO_DIR) as entries:
+                _logo_files = {entry.name: entry.path for entry in entries if entry.is_file()}
+            _logo_dir_mtime = mtime
+    except OSError:
+        pass
+    return _logo_files
 
-    def do_GET(self):
-        if self.path == '/':
-            self.serve_html()
-        elif self.path == '/api/plugins':
-            self.serve_plugins_api()
-        elif self.path.startswith('/logo/') or self.path.endswith('.png'):
-            self.serve_image()
-        else:
-            self.send_error(404, "Page not found")
+def find_logo(image_name):
+    """按文件名查找logo图片
+    :param image_name: 图片文件名
+    :return: 图片绝对路径，不在logo目录中时返回None
+    """
+    image_path = _logo_files.get(image_name)
+    if image_path is None:
+        image_path = refresh_logo_files().get(image_name)
+    return image_path
 
-    def do_POST(self):
-        # 处理API请求
-        if self.path == '/api/plugins':
-            self.serve_plugins_api()
-        elif self.path.startswith('/api/copilot/'):
-            self.serve_copilot_api()
-        else:
-            # 简单的POST处理示例
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(b'{"status": "success"}')
-    
-    def serve_copilot_api(self):
-        """处理Copilot API请求"""
-        try:
-            # 获取请求路径和方法
-            api_method = self.path.split('/')[-1]
-            
-            # 读取请求数据
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            request_data = json.loads(post_data.decode('utf-8'))
-            
-            # 根据API方法处理请求
-            if api_method == 'chat':
-                # 处理聊天请求
-                message = request_data.get('message', '')
-                
-                # 通过API注册表获取Copilot的聊天处理函数
-                if hasattr(self, 'server') and hasattr(self.server, 'plugin_loader'):
-                    # 获取API注册表
-                    from src.api_registry import api_registry
-                    
-                    # 调用Copilot的聊天处理函数
-                    handle_chat_func = api_registry.get_api("Copilot", "handle_chat")
-                    if handle_chat_func:
-                        response = handle_chat_func(message)
-                        
-                        # 发送响应
-                        self.send_response(200)
-                        self.send_header('Content-type', 'application/json')
-                        self.end_headers()
-                        self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8'))
-                    else:
-                        # Copilot聊天处理器未找到
-                        self.send_response(404)
-                        self.send_header('Content-type', 'application/json')
-                        self.end_headers()
-                        self.wfile.write(json.dumps({"error": "Copilot聊天处理器未找到"}, ensure_ascii=False).encode('utf-8'))
-                else:
-                    # API注册表不可用
-                    self.send_response(500)
-                    self.send_header('Content-type', 'application/json')
-                    self.end_headers()
-                    self.wfile.write(json.dumps({"error": "API注册表不可用"}, ensure_ascii=False).encode('utf-8'))
-            else:
-                # 未知API方法
-                self.send_response(404)
-                self.send_header('Content-type', 'application/json')
-                self.end_headers()
-                self.wfile.write(json.dumps({"error": "未知API方法"}, ensure_ascii=False).encode('utf-8'))
-        except Exception as e:
-            # 错误处理
-            self.send_response(500)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            error_response = {"error": f"处理请求时出错: {str(e)}"}
-            self.wfile.write(json.dumps(error_response, ensure_ascii=False).encode('utf-8'))
+refresh_logo_files()
 
-    def serve_html(self):
-        # 每次请求时动态获取最新的插件信息
-        plugins_info = self.get_plugins_info()
-        
-        # 动态生成菜单项HTML
-        menu_items_html = self.generate_menu_items()
-        plugin_cards_html = self.generate_plugin_cards(plugins_info)
-        plugin_count = len(plugins_info)
-        
-        # 动态获取插件CSS内容
-        plugin_css = self.get_plugin_contents_by_position('head', 'css')
-        # 动态获取插件HTML内容
-        plugin_html = self.get_plugin_contents_by_position('body', 'html')
-        # 动态获取插件JS内容
-        plugin_js = self.get_plugin_contents_by_position('body', 'js')
-        
-        html_content = f"""
+def get_image_info(image_path, stat):
+    """
+    获取图片的ETag和MIME类型，文件被替换（修改时间或大小变化）后重新计算
+    :param image_path: 图片路径
+    :param stat: 已打开图片文件的os.fstat结果，保证响应头与实际发送的内容一致
+    :return: (ETag, MIME类型)
+    """
+    cached = _image_cache.get(image_path)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2], cached[3]
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    mime_type = mimetypes.guess_type(image_path)[0] or 'application/octet-stream'
+    _image_cache[image_path] = (stat.st_mtime_ns, stat.st_size, etag, mime_type)
+    return etag, mime_type
+
+# 插件事件流的心跳间隔（秒），同时决定连接断开和服务退出的检测延迟
+SSE_KEEPALIVE_INTERVAL = 5
+# 持久连接的空闲超时（秒），超时后关闭连接以释放工作线程
+KEEPALIVE_TIMEOUT = 10
+# POST请求体的最大字节数
+MAX_BODY = 1 << 20
+# 响应体小于该字节数时不做gzip压缩
+GZIP_MIN_SIZE = 1024
+
+# 固定的错误响应，导入时序列化一次
+ERR_NO_CHAT_HANDLER = json_dumps({"error": "Copilot聊天处理器未找到"})
+ERR_NO_API_REGISTRY = json_dumps({"error": "API注册表不可用"})
+ERR_UNKNOWN_API_METHOD = json_dumps({"error": "未知API方法"})
+
+def gzip_body(body):
+    """响应体足够大时返回gzip压缩后的内容，否则返回None
+    :param body: 响应体 (bytes)
+    :return: 压缩后的内容或None
+    """
+    if len(body) < GZIP_MIN_SIZE:
+        return None
+    return gzip.compress(body, compresslevel=6)
+
+# 预先编码的响应头，send_body直接拼接后一次写出
+STATUS_LINES = {status.value: f'HTTP/1.1 {status.value} {status.phrase}\r\n'.encode('latin-1') for status in HTTPStatus}
+SERVER_HEADER = f'Server: {BaseHTTPRequestHandler.server_version} {BaseHTTPRequestHandler.sys_version}\r\n'.encode('latin-1')
+_content_type_headers = {}
+# Date头按秒缓存 (秒, 编码后的头)
+_date_header = (0, b'')
+
+def date_header():
+    """返回当前时间的Date响应头，同一秒内复用已格式化的结果"""
+    global _date_header
+    now = int(time.time())
+    cached = _date_header
+    if cached[0] != now:
+        cached = (now, f'Date: {email.utils.formatdate(now, usegmt=True)}\r\n'.encode('latin-1'))
+        _date_header = cached
+    return cached[1]
+
+def content_type_header(content_type):
+    """返回编码好的Content-Type响应头"""
+    header = _content_type_headers.get(content_type)
+    if header is None:
+        header = _content_type_headers[content_type] = f'Content-Type: {content_type}\r\n'.encode('latin-1')
+    return header
+
+# 图标精灵图的URL，页面中以 <use href="ICON_SPRITE_PATH#图标名"> 引用
+ICON_SPRITE_PATH = '/static/icons.svg'
+# 内置图标（图标名 -> 24x24画布上的SVG内容），取代整套Font Awesome样式和字体
+BUILTIN_ICONS = {
+    'tachometer-alt': '<path d="M3.34 17a10 10 0 1 1 17.32 0"/><path d="M12 14l4-4"/>',
+    'plug': '<path d="M9 2v6M15 2v6M12 18v4"/><path d="M6 8h12v4a6 6 0 0 1-12 0z"/>',
+    'heartbeat': '<polyline points="22 12 18 12 15 21 9 3 6 12 2 12"/>',
+    'clock': '<circle cx="12" cy="12" r="10"/><polyline points="12 6 12 12 16 14"/>',
+    'microchip': '<rect x="6" y="6" width="12" height="12" rx="1"/><rect x="9" y="9" width="6" height="6"/>'
+                 '<path d="M9 2v4M15 2v4M9 18v4M15 18v4M2 9h4M2 15h4M18 9h4M18 15h4"/>',
+    'user': '<circle cx="12" cy="8" r="4"/><path d="M4 21a8 8 0 0 1 16 0"/>',
+    'code-branch': '<circle cx="6" cy="5" r="2"/><circle cx="6" cy="19" r="2"/><circle cx="18" cy="7" r="2"/>'
+                   '<path d="M6 7v10M18 9c0 5-12 3-12 8"/>',
+    'list': '<path d="M8 6h13M8 12h13M8 18h13M3 6h.01M3 12h.01M3 18h.01"/>',
+    'cog': '<circle cx="12" cy="12" r="3"/>'
+           '<path d="M12 2v3M12 19v3M4.22 4.22l2.12 2.12M17.66 17.66l2.12 2.12M2 12h3M19 12h3M4.22 19.78l2.12-2.12M17.66 6.34l2.12-2.12"/>',
+    'file-alt': '<path d="M14 2H6a2 2 0 0 0-2 2v16a2 2 0 0 0 2 2h12a2 2 0 0 0 2-2V8z"/>'
+                '<polyline points="14 2 14 8 20 8"/><path d="M8 13h8M8 17h8"/>',
+    'chart-line': '<polyline points="3 3 3 21 21 21"/><polyline points="7 15 11 11 14 14 20 8"/>',
+    'bars': '<path d="M3 6h18M3 12h18M3 18h18"/>',
+}
+# 精灵图中找不到图标时使用的默认图标
+DEFAULT_ICON = 'plug'
+# 旧版Font Awesome图标名到内置图标的映射（同名图标无需列出）
+FA_ICON_ALIASES = {
+    'tachometer': 'tachometer-alt', 'dashboard': 'tachometer-alt', 'gauge': 'tachometer-alt',
+    'heart-pulse': 'heartbeat', 'clock-o': 'clock', 'user-o': 'user', 'user-circle': 'user',
+    'gear': 'cog', 'gears': 'cog', 'cogs': 'cog', 'sliders': 'cog',
+    'file': 'file-alt', 'file-text': 'file-alt', 'file-lines': 'file-alt',
+    'line-chart': 'chart-line', 'area-chart': 'chart-line',
+    'navicon': 'bars', 'reorder': 'bars', 'list-ul': 'list', 'list-alt': 'list', 'list-ol': 'list',
+}
+
+def icon_html(name):
+    """生成引用精灵图中图标的SVG标签
+    :param name: 图标名
+    :return: SVG标签HTML
+    """
+    return f'<svg class="icon" aria-hidden="true"><use href="{ICON_SPRITE_PATH}#{html.escape(str(name))}"></use></svg>'
+
+# 页面模板，导入时编译一次，渲染时只做占位符替换
+_PAGE_TEMPLATE = string.Template("""
 <!DOCTYPE html>
 <html lang="zh-CN">
 <head>
@@ -227,15 +166,14 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <link rel="icon" href="/logo/Kaos_Logo.png" type="image/png">
-    <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0-beta3/css/all.min.css">
     <style>
-        * {{
+        * {
             margin: 0;
             padding: 0;
             box-sizing: border-box;
-        }}
+        }
         
-        body {{
+        body {
             font-family: 'Segoe UI', 'Microsoft YaHei', Tahoma, Geneva, Verdana, sans-serif;
             height: 100vh;
             overflow: hidden;
@@ -245,16 +183,16 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             background-image: url('https://images.unsplash.com/photo-1518791841217-8f162f1e1131?ixlib=rb-1.2.1&auto=format&fit=crop&w=1950&q=80');
             background-size: cover;
             background-position: center;
-        }}
+        }
         
-        .container {{
+        .container {
             display: flex;
             height: 100vh;
             overflow: hidden;
-        }}
+        }
         
         /* 左侧导航栏样式 */
-        .sidebar {{
+        .sidebar {
             width: 260px;
             background: linear-gradient(180deg, #2c3e50 0%, #1a2530 100%);
             color: white;
@@ -264,9 +202,9 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             box-shadow: 3px 0 15px rgba(0,0,0,0.2);
             position: relative;
             z-index: 100;
-        }}
+        }
         
-        .sidebar-header {{
+        .sidebar-header {
             padding: 10px 20px;
             background: rgba(0, 0, 0, 0.2);
             border-bottom: 1px solid rgba(255, 255, 255, 0.1);
@@ -275,9 +213,9 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             top: 0;
             background: linear-gradient(180deg, #2c3e50 0%, #1a2530 100%);
             z-index: 101;
-        }}
+        }
         
-        .sidebar-header h1 {{
+        .sidebar-header h1 {
             font-size: 1.8rem;
             font-weight: 700;
             margin: 10px 0 5px;
@@ -286,20 +224,20 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             -webkit-text-fill-color: transparent;
             background-clip: text;
             text-fill-color: transparent;
-        }}
+        }
         
-        .sidebar-header p {{
+        .sidebar-header p {
             font-size: 0.9rem;
             color: #bdc3c7;
             margin-top: 5px;
             opacity: 0.8;
-        }}
+        }
         
-        .sidebar-menu {{
+        .sidebar-menu {
             padding: 15px 0;
-        }}
+        }
         
-        .menu-item {{
+        .menu-item {
             padding: 14px 24px;
             display: flex;
             align-items: center;
@@ -311,21 +249,21 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             position: relative;
             overflow: hidden;
             background: rgba(255, 255, 255, 0.05);
-        }}
+        }
         
-        .menu-item:hover {{
+        .menu-item:hover {
             background: rgba(52, 152, 219, 0.25);
             transform: translateX(6px);
             border-left-color: #3498db;
-        }}
+        }
         
-        .menu-item.active {{
+        .menu-item.active {
             background: rgba(46, 204, 113, 0.25);
             border-left: 4px solid #2ecc71;
             transform: translateX(6px);
-        }}
+        }
         
-        .menu-item.active::before {{
+        .menu-item.active::before {
             content: '';
             position: absolute;
             top: 0;
@@ -335,29 +273,34 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             background: linear-gradient(90deg, transparent, rgba(255,255,255,0.1), transparent);
             transform: translateX(-100%);
             animation: shimmer 1.5s infinite;
-        }}
+        }
         
-        @keyframes shimmer {{
-            100% {{
+        @keyframes shimmer {
+            100% {
                 transform: translateX(100%);
-            }}
-        }}
+            }
+        }
+        
+        .icon {
+            width: 1em;
+            height: 1em;
+            vertical-align: -0.125em;
+            flex-shrink: 0;
+        }
         
-        .menu-item i {{
+        .menu-item .icon {
             margin-right: 15px;
             font-size: 1.2rem;
-            width: 24px;
-            text-align: center;
             color: #3498db;
-        }}
+        }
         
-        .menu-item span {{
+        .menu-item span {
             font-size: 1.05rem;
             font-weight: 500;
-        }}
+        }
         
         /* 右侧内容区域样式 */
-        .main-content {{
+        .main-content {
             flex: 1;
             display: flex;
             flex-direction: column;
@@ -366,9 +309,9 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             backdrop-filter: blur(10px);
             -webkit-backdrop-filter: blur(10px);
             border-left: 1px solid rgba(255, 255, 255, 0.1);
-        }}
+        }
         
-        .content-header {{
+        .content-header {
             padding: 25px 30px;
             background: rgba(255, 255, 255, 0.7);
             backdrop-filter: blur(10px);
@@ -376,46 +319,46 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             box-shadow: 0 2px 15px rgba(0,0,0,0.1);
             z-index: 10;
             border-bottom: 1px solid rgba(255, 255, 255, 0.2);
-        }}
+        }
         
-        .content-header h2 {{
+        .content-header h2 {
             color: #2c3e50;
             font-size: 1.8rem;
             font-weight: 700;
             margin-bottom: 8px;
             display: flex;
             align-items: center;
-        }}
+        }
         
-        .content-header h2 i {{
+        .content-header h2 .icon {
             margin-right: 12px;
             color: #3498db;
-        }}
+        }
         
-        .content-header p {{
+        .content-header p {
             color: #7f8c8d;
             font-size: 1rem;
             margin: 0;
-        }}
+        }
         
-        .content-body {{
+        .content-body {
             flex: 1;
             padding: 25px;
             overflow-y: auto;
             background: rgba(245, 247, 250, 0.7);
             backdrop-filter: blur(5px);
             -webkit-backdrop-filter: blur(5px);
-        }}
+        }
         
         /* 统计信息样式 */
-        .stats-container {{
+        .stats-container {
             display: grid;
             grid-template-columns: repeat(auto-fit, minmax(260px, 1fr));
             gap: 20px;
             margin-bottom: 30px;
-        }}
+        }
         
-        .stat-card {{
+        .stat-card {
             background: rgba(255, 255, 255, 0.85);
             backdrop-filter: blur(10px);
             -webkit-backdrop-filter: blur(10px);
@@ -428,14 +371,14 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             border: 1px solid rgba(255, 255, 255, 0.2);
             position: relative;
             overflow: hidden;
-        }}
+        }
         
-        .stat-card:hover {{
+        .stat-card:hover {
             transform: translateY(-5px);
             box-shadow: 0 15px 40px rgba(0,0,0,0.12);
-        }}
+        }
         
-        .stat-card::before {{
+        .stat-card::before {
             content: '';
             position: absolute;
             top: 0;
@@ -445,15 +388,15 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             background: linear-gradient(90deg, #3498db, #2ecc71, #e74c3c, #f39c12);
             background-size: 400% 400%;
             animation: gradientBG 3s ease infinite;
-        }}
+        }
         
-        @keyframes gradientBG {{
-            0% {{ background-position: 0% 50%; }}
-            50% {{ background-position: 100% 50%; }}
-            100% {{ background-position: 0% 50%; }}
-        }}
+        @keyframes gradientBG {
+            0% { background-position: 0% 50%; }
+            50% { background-position: 100% 50%; }
+            100% { background-position: 0% 50%; }
+        }
         
-        .stat-icon {{
+        .stat-icon {
             font-size: 2.2rem;
             margin-bottom: 15px;
             width: 70px;
@@ -465,9 +408,9 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             margin-top: 10px;
-        }}
+        }
         
-        .stat-value {{
+        .stat-value {
             font-size: 2.5rem;
             font-weight: 800;
             color: #2c3e50;
@@ -477,39 +420,39 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             -webkit-background-clip: text;
             -webkit-text-fill-color: transparent;
             background-clip: text;
-        }}
+        }
         
-        .stat-label {{
+        .stat-label {
             color: #7f8c8d;
             font-size: 0.95rem;
             text-align: center;
             font-weight: 500;
             margin-top: 5px;
-        }}
+        }
         
         /* 插件卡片样式 */
-        .plugins-title {{
+        .plugins-title {
             display: flex;
             align-items: center;
             margin: 25px 0 20px;
             color: #2c3e50;
             font-size: 1.3rem;
             font-weight: 600;
-        }}
+        }
         
-        .plugins-title i {{
+        .plugins-title .icon {
             margin-right: 10px;
             color: #3498db;
-        }}
+        }
         
-        .plugins-grid {{
+        .plugins-grid {
             display: grid;
             grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
             gap: 20px;
             margin-top: 10px;
-        }}
+        }
         
-        .plugin-card {{
+        .plugin-card {
             background: rgba(255, 255, 255, 0.85);
             backdrop-filter: blur(10px);
             -webkit-backdrop-filter: blur(10px);
@@ -521,14 +464,14 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             overflow: hidden;
             border: 1px solid rgba(255, 255, 255, 0.2);
             animation: fadeInUp 0.6s ease-out;
-        }}
+        }
         
-        .plugin-card:hover {{
+        .plugin-card:hover {
             transform: translateY(-8px) scale(1.02);
             box-shadow: 0 15px 40px rgba(0,0,0,0.15);
-        }}
+        }
         
-        .plugin-card::before {{
+        .plugin-card::before {
             content: '';
             position: absolute;
             top: 0;
@@ -538,29 +481,29 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             background: linear-gradient(90deg, #3498db, #2ecc71, #e74c3c, #f39c12);
             background-size: 400% 400%;
             animation: gradientBG 3s ease infinite;
-        }}
+        }
         
-        @keyframes fadeInUp {{
-            from {{
+        @keyframes fadeInUp {
+            from {
                 opacity: 0;
                 transform: translateY(30px);
-            }}
-            to {{
+            }
+            to {
                 opacity: 1;
                 transform: translateY(0);
-            }}
-        }}
+            }
+        }
         
-        .plugin-name {{
+        .plugin-name {
             font-size: 1.4rem;
             font-weight: 700;
             color: #2c3e50;
             margin-bottom: 12px;
             position: relative;
             padding-bottom: 10px;
-        }}
+        }
         
-        .plugin-name::after {{
+        .plugin-name::after {
             content: '';
             position: absolute;
             bottom: 0;
@@ -569,22 +512,22 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             height: 3px;
             background: linear-gradient(90deg, #3498db, #2ecc71);
             border-radius: 2px;
-        }}
+        }
         
-        .plugin-developer {{
+        .plugin-developer {
             color: #7f8c8d;
             margin: 10px 0;
             font-size: 1rem;
             display: flex;
             align-items: center;
-        }}
+        }
         
-        .plugin-developer i {{
+        .plugin-developer .icon {
             margin-right: 8px;
             color: #3498db;
-        }}
+        }
         
-        .plugin-version {{
+        .plugin-version {
             color: #2ecc71;
             font-weight: 600;
             font-size: 0.95rem;
@@ -594,70 +537,71 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
             border-radius: 20px;
             margin-top: 8px;
             border: 1px solid rgba(46, 204, 113, 0.2);
-        }}
+        }
         
-        .plugin-description {{
+        .plugin-description {
             color: #7f8c8d;
             font-size: 0.9rem;
             margin-top: 12px;
             line-height: 1.5;
-        }}
+        }
         
         /* 响应式设计 */
-        @media (max-width: 768px) {{
-            .sidebar {{
+        @media (max-width: 768px) {
+            .sidebar {
                 width: 80px;
-            }}
+            }
             
-            .sidebar-header h1, .sidebar-header p, .menu-item span {{
+            .sidebar-header h1, .sidebar-header p, .menu-item span {
                 display: none;
-            }}
+            }
             
-            .menu-item {{
+            .menu-item {
                 justify-content: center;
                 padding: 18px;
-            }}
+            }
             
-            .menu-item i {{
+            .menu-item .icon {
                 margin-right: 0;
                 font-size: 1.4rem;
-            }}
+            }
             
-            .content-header h2 {{
+            .content-header h2 {
                 font-size: 1.5rem;
-            }}
+            }
             
-            .stats-container {{
+            .stats-container {
                 grid-template-columns: 1fr;
-            }}
+            }
             
-            .plugins-grid {{
+            .plugins-grid {
                 grid-template-columns: 1fr;
-            }}
-        }}
+            }
+        }
         
         /* 滚动条样式 */
-        ::-webkit-scrollbar {{
+        ::-webkit-scrollbar {
             width: 10px;
-        }}
+        }
         
-        ::-webkit-scrollbar-track {{
+        ::-webkit-scrollbar-track {
             background: #f1f1f1;
             border-radius: 10px;
-        }}
+        }
         
-        ::-webkit-scrollbar-thumb {{
+        ::-webkit-scrollbar-thumb {
             background: linear-gradient(180deg, #3498db, #2c3e50);
             border-radius: 10px;
-        }}
+        }
         
-        ::-webkit-scrollbar-thumb:hover {{
+        ::-webkit-scrollbar-thumb:hover {
             background: linear-gradient(180deg, #2ecc71, #27ae60);
-        }}
+        }
         
         /* 插件CSS内容 */
-        {plugin_css}
+        ${plugin_css}
     </style>
+    ${plugin_head_html}
 </head>
 <body>
     
@@ -669,14 +613,14 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
                 <img src="/logo/Kaos_White.png" alt="Kaos Logo" style="max-width: 80%; height: auto; margin: 10px auto; display: block;">
             </div>
             <div class="sidebar-menu" id="sidebar-menu">
-                {menu_items_html}
+                ${menu_items_html}
             </div>
         </div>
         
         <!-- 右侧内容区域 -->
         <div class="main-content">
             <div class="content-header">
-                <h2><i class="fas fa-tachometer-alt"></i> 系统仪表板</h2>
+                <h2><svg class="icon" aria-hidden="true"><use href="/static/icons.svg#tachometer-alt"></use></svg> 系统仪表板</h2>
                 <p>欢迎使用Kaos系统管理平台</p>
             </div>
             <div class="content-body">
@@ -684,15 +628,15 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
                 <div class="stats-container">
                     <div class="stat-card">
                         <div class="stat-icon">
-                            <i class="fas fa-plug"></i>
+                            <svg class="icon" aria-hidden="true"><use href="/static/icons.svg#plug"></use></svg>
                         </div>
                         <div class="stat-label">已加载插件</div>
-                        <div class="stat-value">{plugin_count}</div>
+                        <div class="stat-value">${plugin_count}</div>
                         <div class="stat-label">个插件正在运行</div>
                     </div>
                     <div class="stat-card">
                         <div class="stat-icon">
-                            <i class="fas fa-heartbeat"></i>
+                            <svg class="icon" aria-hidden="true"><use href="/static/icons.svg#heartbeat"></use></svg>
                         </div>
                         <div class="stat-label">系统状态</div>
                         <div class="stat-value">正常</div>
@@ -700,15 +644,15 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
                     </div>
                     <div class="stat-card">
                         <div class="stat-icon">
-                            <i class="fas fa-clock"></i>
+                            <svg class="icon" aria-hidden="true"><use href="/static/icons.svg#clock"></use></svg>
                         </div>
                         <div class="stat-label">运行时间</div>
-                        <div class="stat-value">0</div>
+                        <div class="stat-value">${uptime_days}</div>
                         <div class="stat-label">天</div>
                     </div>
                     <div class="stat-card">
                         <div class="stat-icon">
-                            <i class="fas fa-microchip"></i>
+                            <svg class="icon" aria-hidden="true"><use href="/static/icons.svg#microchip"></use></svg>
                         </div>
                         <div class="stat-label">CPU使用率</div>
                         <div class="stat-value">32%</div>
@@ -718,157 +662,847 @@ class WebInterfaceHandler(BaseHTTPRequestHandler):
                 
                 <!-- 插件列表 -->
                 <div class="plugins-title">
-                    <i class="fas fa-list"></i>
+                    <svg class="icon" aria-hidden="true"><use href="/static/icons.svg#list"></use></svg>
                     <span>已加载插件</span>
                 </div>
                 <div class="plugins-grid" id="plugins-container">
-                    {plugin_cards_html}
+                    ${plugin_cards_html}
                 </div>
             </div>
         </div>
     </div>
     
     <!-- 插件HTML内容 -->
-    {plugin_html}
+    ${plugin_html}
     
     <script>
         
         
         // 菜单切换功能
-        function handleMenuItemClick(view, evt) {{
+        function handleMenuItemClick(view, evt) {
             // 移除所有激活状态
             document.querySelectorAll('.menu-item').forEach(i => i.classList.remove('active'));
             // 添加当前激活状态
-            if (evt && evt.currentTarget) {{
+            if (evt && evt.currentTarget) {
                 evt.currentTarget.classList.add('active');
-            }}
+            }
             
             // 更新内容标题
-            const titles = {{
+            const titles = {
                 'dashboard': '系统仪表板',
                 'plugins': '插件管理',
                 'settings': '系统设置',
                 'logs': '日志查看',
                 'analytics': '数据分析'
-            }};
+            };
             
-            const icons = {{
+            const icons = {
                 'dashboard': 'tachometer-alt',
                 'plugins': 'plug',
                 'settings': 'cog',
                 'logs': 'file-alt',
                 'analytics': 'chart-line'
-            }};
+            };
             
-            const descriptions = {{
+            const descriptions = {
                 'dashboard': '欢迎使用Kaos系统管理平台',
                 'plugins': '管理系统中安装的所有插件',
                 'settings': '配置系统参数和选项',
                 'logs': '查看系统运行日志',
                 'analytics': '分析系统性能和使用情况'
-            }};
+            };
             
             // 检查是否是动态注册的菜单项
-            const dynamicTitles = {{}};
-            const dynamicIcons = {{}};
-            const dynamicDescriptions = {{}};
+            const dynamicTitles = {};
+            const dynamicIcons = {};
+            const dynamicDescriptions = {};
             
-            document.querySelector('.content-header h2').innerHTML = `<i class="fas fa-${{icons[view] || dynamicIcons[view] || 'bars'}}"></i> ${{titles[view] || dynamicTitles[view] || '系统管理'}}`;
+            document.querySelector('.content-header h2').innerHTML = `<svg class="icon" aria-hidden="true"><use href="/static/icons.svg#$${icons[view] || dynamicIcons[view] || 'bars'}"></use></svg> $${titles[view] || dynamicTitles[view] || '系统管理'}`;
             document.querySelector('.content-header p').textContent = descriptions[view] || dynamicDescriptions[view] || 'Kaos系统管理平台';
             
             // 这里可以根据视图加载不同的内容
-            if (view === 'plugins') {{
+            if (view === 'plugins') {
                 // 插件管理视图可以显示更详细的插件信息
                 console.log('切换到插件管理视图');
-            }} else if (view === 'settings') {{
+            } else if (view === 'settings') {
                 // 系统设置视图
                 console.log('切换到系统设置视图');
-            }} else if (view === 'logs') {{
+            } else if (view === 'logs') {
                 // 日志查看视图
                 console.log('切换到日志查看视图');
-            }} else if (view === 'analytics') {{
+            } else if (view === 'analytics') {
                 // 数据分析视图
                 console.log('切换到数据分析视图');
-            }} else {{
+            } else {
                 // 处理动态注册的菜单项
-                console.log(`切换到动态视图: ${{view}}`);
-            }}
-        }}
+                console.log(`切换到动态视图: $${view}`);
+            }
+        }
         
         // 为静态菜单项添加事件监听器
-        document.querySelectorAll('.menu-item').forEach(item => {{
-            item.addEventListener('click', function(e) {{
+        document.querySelectorAll('.menu-item').forEach(item => {
+            item.addEventListener('click', function(e) {
                 const view = this.getAttribute('data-view');
                 handleMenuItemClick(view, e);
-            }});
-        }});
-        
-        // 每5秒刷新一次插件信息
-        setInterval(() => {{
-            fetch('/api/plugins')
-                .then(response => response.json())
-                .then(data => {{
-                    document.getElementById('plugins-container').innerHTML = generatePluginCards(data);
-                    // 更新插件统计信息
-                    document.querySelector('.stat-value').textContent = data.length;
-                }});
-        }}, 5000);
-        
-        function generatePluginCards(plugins) {{
+            });
+        });
+        
+        // 订阅插件事件流，插件列表变化时由服务器推送
+        const pluginEvents = new EventSource('/api/plugins/stream');
+        pluginEvents.onmessage = (event) => {
+            const data = JSON.parse(event.data);
+            document.getElementById('plugins-container').innerHTML = generatePluginCards(data);
+            // 更新插件统计信息
+            document.querySelector('.stat-value').textContent = data.length;
+        };
+        
+        function generatePluginCards(plugins) {
             let html = '';
-            plugins.forEach(plugin => {{
+            plugins.forEach(plugin => {
                 html += `
                     <div class="plugin-card">
-                        <div class="plugin-name">${{plugin.name}}</div>
-                        <div class="plugin-developer"><i class="fas fa-user"></i> 开发者: ${{plugin.developer}}</div>
-                        <div class="plugin-version"><i class="fas fa-code-branch"></i> 版本: ${{plugin.version}}</div>
+                        <div class="plugin-name">$${plugin.name}</div>
+                        <div class="plugin-developer"><svg class="icon" aria-hidden="true"><use href="/static/icons.svg#user"></use></svg> 开发者: $${plugin.developer}</div>
+                        <div class="plugin-version"><svg class="icon" aria-hidden="true"><use href="/static/icons.svg#code-branch"></use></svg> 版本: $${plugin.version}</div>
                         <div class="plugin-description">这是一个强大的Kaos插件，提供丰富的功能和特性。</div>
                     </div>
                 `;
-            }});
+            });
             return html;
-        }}
-        
-        // 更新运行时间
-        function updateUptime() {{
-            const uptimeElement = document.querySelector('.stat-value:nth-child(3)');
-            if (uptimeElement) {{
-                // 这里可以实现实际的运行时间计算
-                // 暂时使用模拟数据
-                uptimeElement.textContent = Math.floor(Math.random() * 30) + 1;
-            }}
-        }}
-        
-        // 定期更新运行时间
-        setInterval(updateUptime, 60000);
-        updateUptime();
+        }
         
         // 插件JS内容
-        {plugin_js}
+        ${plugin_js}
     </script>
 </body>
 </html>
-"""
+""")
+
+class WebInterfaceHandler(BaseHTTPRequestHandler):
+    # 使用HTTP/1.1持久连接，所有响应都需带Content-Length
+    protocol_version = 'HTTP/1.1'
+    # 空闲连接的读超时
+    timeout = KEEPALIVE_TIMEOUT
+    # 存储注册的菜单项（不可变元组，写入时整体替换，读取方无需加锁）
+    registered_menu_items = ()
+    # 存储注册的插件内容（不可变元组，写入时整体替换，读取方无需加锁）
+    registered_plugin_contents = ()
+    # 插件内容索引 (位置, 内容类型) -> 已拼接好的内容字符串，随注册整体替换
+    _content_index = {}
+    # 注册表写锁，插件并发启动时保护菜单项与插件内容的替换
+    _registry_lock = threading.Lock()
+    # 存储注册的静态资源（URL路径 -> 资源信息）
+    registered_static_assets = {}
+    # 注册表版本号，注册菜单项或插件内容时递增，用于判断页面缓存是否失效
+    _registry_version = 0
+    # 插件信息缓存 (插件列表版本, 插件信息, JSON字节串, gzip压缩的JSON字节串)
+    _plugins_info_cache = None
+    # 正在构建中的插件信息缓存，并发的缓存未命中共享同一次构建
+    _plugins_future = None
+    _plugins_lock = threading.Lock()
+    # 插件卡片HTML缓存 (名称, 开发者, 版本) -> HTML片段
+    _card_cache = {}
+    # 路由表：精确路径 -> 处理方法名，以及按顺序匹配的 (路径前缀, 处理方法名)
+    _GET_ROUTES = {
+        '/': 'serve_html',
+        '/api/plugins': 'serve_plugins_api',
+        '/api/plugins/stream': 'serve_plugins_sse',
+    }
+    _GET_PREFIXES = (('/logo/', 'serve_image'),)
+    _POST_ROUTES = {'/api/plugins': 'serve_plugins_api'}
+    _POST_PREFIXES = (('/api/copilot/', 'serve_copilot_api'),)
+    # 图标精灵图中的图标（图标名 -> (SVG内容, viewBox)）
+    _icons = {name: (svg, '0 0 24 24') for name, svg in BUILTIN_ICONS.items()}
+    # 渲染好的页面缓存 (缓存键, 页面字节串, gzip压缩的页面字节串)
+    _html_cache = None
+    
+    @classmethod
+    def register_menu_item(cls, name, icon, view, callback=None):
+        """注册菜单项到sidebar
+        :param name: 菜单项名称
+        :param icon: 图标名，取自内置图标精灵图（BUILTIN_ICONS）或通过register_icon注册的图标；
+                     旧版Font Awesome类名会映射到对应图标，找不到时使用默认图标
+        :param view: 视图标识符
+        :param callback: 可选的回调函数
+        """
+        icon = cls.resolve_icon(icon)
+        menu_item = {
+            'name': name,
+            'icon': icon,
+            'view': view,
+            'callback': callback
+        }
+        # 注册时一次性渲染好菜单项HTML片段，生成页面时直接拼接
+        view_attr = html.escape(str(view))
+        menu_item['_html'] = f'''
+            <div class="menu-item" data-view="{view_attr}" onclick="handleMenuItemClick('{view_attr}', event)">
+                {icon_html(icon)}
+                <span>{html.escape(str(name))}</span>
+            </div>
+            '''
+        with cls._registry_lock:
+            cls.registered_menu_items = (*cls.registered_menu_items, menu_item)
+            cls._registry_version += 1
+    
+    @classmethod
+    def register_plugin_content(cls, plugin_name, content_type, content, position="body"):
+        """注册插件内容到页面
+        :param plugin_name: 插件名称
+        :param content_type: 内容类型 ('html', 'css', 'js')
+        :param content: 内容字符串
+        :param position: 内容位置 ('head', 'body', 'footer')
+        """
+        plugin_content = {
+            'plugin_name': plugin_name,
+            'content_type': content_type,
+            'content': content,
+            'position': position
+        }
+        with cls._registry_lock:
+            cls.registered_plugin_contents = (*cls.registered_plugin_contents, plugin_content)
+            cls._index_plugin_contents((plugin_content,))
+            cls._registry_version += 1
+    
+    @classmethod
+    def register_plugin_contents(cls, plugin_name, contents):
+        """批量注册插件内容到页面
+        :param plugin_name: 插件名称
+        :param contents: 内容列表，每项为 (content_type, content, position)
+        """
+        new_contents = tuple(
+            {
+                'plugin_name': plugin_name,
+                'content_type': content_type,
+                'content': content,
+                'position': position
+            }
+            for content_type, content, position in contents
+        )
+        with cls._registry_lock:
+            cls.registered_plugin_contents = cls.registered_plugin_contents + new_contents
+            cls._index_plugin_contents(new_contents)
+            cls._registry_version += 1
+    
+    @classmethod
+    def resolve_icon(cls, icon):
+        """将图标名解析为精灵图中的图标，兼容旧版Font Awesome类名（如 "fas fa-cog"）
+        :param icon: 图标名或Font Awesome类名
+        :return: 精灵图中存在的图标名，找不到时返回默认图标
+        """
+        icons = cls._icons
+        icon = str(icon)
+        if icon in icons:
+            return icon
+        # 从Font Awesome类名中取出带fa-前缀的图标名，跳过fa-solid、fa-fw等样式类
+        for token in icon.split():
+            name = token[3:] if token.startswith('fa-') else token
+            name = FA_ICON_ALIASES.get(name, name)
+            if name in icons:
+                return name
+        print(f"警告: 图标 {icon} 不在图标精灵图中，已使用默认图标 {DEFAULT_ICON}（可先通过register_icon注册）")
+        return DEFAULT_ICON
+    
+    @classmethod
+    def register_icon(cls, name, svg, view_box='0 0 24 24'):
+        """注册图标到精灵图，菜单项等处即可按图标名引用
+        :param name: 图标名
+        :param svg: 图标的SVG内容（不含外层svg标签），默认以currentColor描边、无填充
+        :param view_box: 图标的viewBox
+        """
+        with cls._registry_lock:
+            cls._icons = {**cls._icons, name: (svg, view_box)}
+        cls.publish_icon_sprite()
+    
+    @classmethod
+    def publish_icon_sprite(cls):
+        """把当前所有图标生成精灵图，注册为静态资源"""
+        symbols = []
+        for name, (svg, view_box) in cls._icons.items():
+            symbols.append(
+                f'<symbol id="{html.escape(name)}" viewBox="{view_box}" fill="none" stroke="currentColor" '
+                f'stroke-width="2" stroke-linecap="round" stroke-linejoin="round">{svg}</symbol>'
+            )
+        sprite = f'<svg xmlns="http://www.w3.org/2000/svg">{"".join(symbols)}</svg>'.encode('utf-8')
+        gzipped = gzip_body(sprite)
+        cls.register_static_asset(ICON_SPRITE_PATH, sprite, 'image/svg+xml',
+                                  precompressed={'gzip': gzipped} if gzipped else None)
+    
+    @classmethod
+    def _index_plugin_contents(cls, new_contents):
+        """把新注册的插件内容追加到对应 (位置, 内容类型) 分组的拼接结果上，
+        其他分组沿用已拼接好的字符串，调用方需持有注册表写锁
+        :param new_contents: 新注册的插件内容
+        """
+        content_index = dict(cls._content_index)
+        for plugin_content in new_contents:
+            key = (plugin_content['position'], plugin_content['content_type'])
+            joined = content_index.get(key)
+            content_index[key] = plugin_content['content'] if joined is None else joined + '\n' + plugin_content['content']
+        cls._content_index = content_index
+    
+    @classmethod
+    def register_static_asset(cls, url_path, content, mime_type, precompressed=None, immutable=False):
+        """注册静态资源，由Web服务器按URL直接返回
+        :param url_path: 资源URL路径 (如 '/static/copilot/copilot.css')
+        :param content: 资源内容 (bytes)
+        :param mime_type: 资源的Content-Type
+        :param precompressed: 预压缩的资源内容 {编码名: bytes}，如 {'gzip': ..., 'br': ...}
+        :param immutable: 为True时允许浏览器长期缓存，引用方应在URL中带上返回的版本号
+        :return: 资源版本号（内容哈希），可作为URL参数 ?v=版本号 使用
+        """
+        version = hashlib.blake2b(content, digest_size=8).hexdigest()
+        cls.registered_static_assets[url_path] = {
+            'content': content,
+            'mime_type': mime_type,
+            'encodings': dict(precompressed or {}),
+            'version': version,
+            'cache_control': 'public, max-age=31536000, immutable' if immutable else 'no-cache'
+        }
+        return version
+    
+    def generate_menu_items(self):
+        """生成菜单项HTML"""
+        # 取一次快照，遍历期间不受并发注册影响
+        items = self.registered_menu_items
+        return ''.join(item['_html'] for item in items) or '<!-- 功能区已清空 -->'
+
+    def serve_image(self):
+        # 只返回logo文件夹中已存在的图片，拒绝其他任何路径
+        path = self.path.split('?', 1)[0]
+        image_path = find_logo(path[6:]) if path.startswith('/logo/') else None
+        if image_path is None:
+            self.send_error(404, "Image not found")
+            return
+        try:
+            f = open(image_path, 'rb')
+        except OSError:
+            self.send_error(404, "Image not found")
+            return
+        with f:
+            # 从已打开的文件取大小和修改时间，文件在此之后被替换也不影响本次发送的内容
+            stat = os.fstat(f.fileno())
+            etag, mime_type = get_image_info(image_path, stat)
+            not_modified = self.etag_matches(etag)
+            self.send_response(304 if not_modified else 200)
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'public, max-age=86400')
+            if not_modified:
+                self.end_headers()
+                return
+            self.send_header('Content-type', mime_type)
+            self.send_header('Content-Length', str(stat.st_size))
+            self.end_headers()
+            # 由内核直接把文件内容拷贝到套接字，不支持sendfile的平台会自动退回普通发送
+            self.connection.sendfile(f, 0, stat.st_size)
+
+    def get_accepted_encodings(self):
+        """解析请求头Accept-Encoding，返回客户端接受的编码集合"""
+        accepted = set()
+        for token in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = token.partition(';')
+            name = name.strip().lower()
+            if not name:
+                continue
+            params = params.replace(' ', '').lower()
+            if params.startswith('q='):
+                # q=0表示客户端明确拒绝该编码
+                try:
+                    if float(params[2:]) == 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(name)
+        return accepted
+
+    def etag_matches(self, etag):
+        """判断请求头If-None-Match是否与给定ETag匹配（客户端缓存仍然有效）"""
+        if_none_match = self.headers.get('If-None-Match', '')
+        return if_none_match.strip() == '*' or etag in (
+            tag.strip().removeprefix('W/') for tag in if_none_match.split(',')
+        )
+
+    def serve_static_asset(self, asset):
+        """返回已注册的静态资源，客户端支持时直接发送预压缩的版本，缓存未变化时返回304"""
+        body = asset['content']
+        content_encoding = None
+        accepted = self.get_accepted_encodings()
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in asset['encodings']:
+                body = asset['encodings'][encoding]
+                content_encoding = encoding
+                break
+        
+        # 不同编码的响应体不同，ETag也需区分
+        etag = f'"{asset["version"]}-{content_encoding}"' if content_encoding else f'"{asset["version"]}"'
+        not_modified = self.etag_matches(etag)
+        
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', asset['cache_control'])
+        if asset['encodings']:
+            self.send_header('Vary', 'Accept-Encoding')
+        if not_modified:
+            self.end_headers()
+            return
+        self.send_header('Content-type', asset['mime_type'])
+        self.send_header('Content-Length', str(len(body)))
+        if content_encoding:
+            self.send_header('Content-Encoding', content_encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_body(self, content_type, body, gzipped=None, status=200):
+        """发送带Content-Length的完整响应，客户端支持时发送gzip压缩的版本
+        :param content_type: 响应的Content-Type
+        :param body: 响应体 (bytes)
+        :param gzipped: 预先压缩好的响应体，None表示不压缩
+        :param status: HTTP状态码
+        """
+        headers = [STATUS_LINES[status], SERVER_HEADER, date_header(), content_type_header(content_type)]
+        if gzipped is not None:
+            headers.append(b'Vary: Accept-Encoding\r\n')
+            if 'gzip' in self.get_accepted_encodings():
+                body = gzipped
+                headers.append(b'Content-Encoding: gzip\r\n')
+        headers.append(b'Content-Length: %d\r\n\r\n' % len(body))
+        headers.append(body)
+        # 响应头和响应体合并为一次写出
+        self.wfile.write(b''.join(headers))
+
+    def log_request(self, code='-', size='-'):
+        # 访问日志逐条写stderr开销较大，不再记录；错误仍由log_error输出
+        pass
+
+    def log_error(self, format, *args):
+        # 持久连接空闲超时是正常关闭，不作为错误记录
+        if format.startswith('Request timed out'):
+            return
+        super().log_error(format, *args)
+
+    def send_json(self, data, status=200):
+        """以JSON格式发送响应
+        :param data: 可序列化为JSON的数据
+        :param status: HTTP状态码
+        """
+        self.send_body('application/json', json_dumps(data), status=status)
+
+    def serve_plugins_api(self):
+        plugins_cache = self.get_plugins_info_cache(getattr(self.server, 'plugin_loader', None))
+        self.send_body('application/json', plugins_cache[2], plugins_cache[3])
+
+    def serve_plugins_sse(self):
+        """以Server-Sent Events推送插件信息，发送响应头后连接交给事件广播线程，不再占用工作线程"""
+        event_hub = getattr(self.server, 'event_hub', None)
+        if event_hub is None:
+            self.send_error(404, "Page not found")
+            return
         self.send_response(200)
-        self.send_header('content-type', 'text/html; charset=utf-8')
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        # 事件流没有Content-Length，以关闭连接结束响应
+        self.send_header('Connection', 'close')
         self.end_headers()
-        self.wfile.write(html_content.encode('utf-8'))
+        self.close_connection = True
+        event_hub.subscribe(self.connection)
 
-def run_web_server(plugin_loader):
-    # 读取配置文件
-    config_path = os.path.join(os.path.dirname(__file__), 'config.json')
+    def get_plugins_info(self):
+        # 获取插件信息
+        return self.get_plugins_info_cache(getattr(self.server, 'plugin_loader', None))[1]
+
+    @classmethod
+    def get_plugins_info_cache(cls, plugin_loader):
+        """获取插件信息缓存，插件列表未变化时直接复用
+        :param plugin_loader: 插件加载器，可为None
+        :return: (插件列表版本, 插件信息元组, JSON字节串, gzip压缩的JSON字节串)
+        """
+        version = (id(plugin_loader), getattr(plugin_loader, 'version', None))
+        plugins_cache = WebInterfaceHandler._plugins_info_cache
+        if plugins_cache is not None and plugins_cache[0] == version:
+            return plugins_cache
+        
+        with WebInterfaceHandler._plugins_lock:
+            future = WebInterfaceHandler._plugins_future
+            is_builder = future is None
+            if is_builder:
+                future = WebInterfaceHandler._plugins_future = Future()
+        
+        if not is_builder:
+            # 已有请求在构建，等待它的结果
+            try:
+                plugins_cache = future.result(timeout=1)
+                if plugins_cache[0] == version:
+                    return plugins_cache
+            except FutureTimeoutError:
+                pass
+            # 等待超时或构建的是其他版本时自行构建
+            return cls.build_plugins_info_cache(plugin_loader, version)
+        
+        try:
+            plugins_cache = cls.build_plugins_info_cache(plugin_loader, version)
+            future.set_result(plugins_cache)
+            return plugins_cache
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with WebInterfaceHandler._plugins_lock:
+                WebInterfaceHandler._plugins_future = None
+
+    @classmethod
+    def build_plugins_info_cache(cls, plugin_loader, version):
+        """遍历插件列表构建插件信息缓存
+        :param plugin_loader: 插件加载器，可为None
+        :param version: 插件列表版本
+        :return: (插件列表版本, 插件信息元组, JSON字节串, gzip压缩的JSON字节串)
+        """
+        plugins_info = []
+        if plugin_loader is not None:
+            for plugin in plugin_loader.get_plugins():
+                manifest = plugin['manifest']
+                plugins_info.append({
+                    "name": manifest['pluginName'],
+                    "developer": manifest['Developer'],
+                    "version": manifest['version']
+                })
+        json_bytes = json_dumps(plugins_info)
+        plugins_cache = (version, tuple(plugins_info), json_bytes, gzip_body(json_bytes))
+        WebInterfaceHandler._plugins_info_cache = plugins_cache
+        return plugins_cache
+
+    def get_plugin_contents_by_position(self, position, content_type):
+        """根据位置和类型获取插件内容"""
+        return self._content_index.get((position, content_type), '')
+    
+    def generate_plugin_cards(self, plugins_info):
+        """生成插件卡片的HTML"""
+        if not plugins_info:
+            return '<p>暂无插件</p>'
+        
+        card_cache = WebInterfaceHandler._card_cache
+        cards = []
+        for plugin in plugins_info:
+            key = (plugin['name'], plugin['developer'], plugin['version'])
+            card_html = card_cache.get(key)
+            if card_html is None:
+                name, developer, version = (html.escape(str(value)) for value in key)
+                card_html = f'''
+                <div class="plugin-card">
+                    <div class="plugin-name">{name}</div>
+                    <div class="plugin-developer">{icon_html('user')} 开发者: {developer}</div>
+                    <div class="plugin-version">{icon_html('code-branch')} 版本: {version}</div>
+                    <div class="plugin-description">这是一个强大的Kaos插件，提供丰富的功能和特性。</div>
+                </div>
+            '''
+                card_cache[key] = card_html
+            cards.append(card_html)
+        return ''.join(cards)
+
+    def find_route(self, routes, prefixes):
+        """按请求路径查找处理方法，先精确匹配再按前缀匹配
+        :param routes: 路径 -> 处理方法名
+        :param prefixes: (路径前缀, 处理方法名) 元组
+        :return: 处理方法，未找到时返回None
+        """
+        path = self.path.split('?', 1)[0]
+        handler_name = routes.get(path)
+        if handler_name is None:
+            handler_name = next((name for prefix, name in prefixes if path.startswith(prefix)), None)
+        return getattr(self, handler_name) if handler_name else None
+
+    def do_GET(self):
+        static_asset = self.registered_static_assets.get(self.path.split('?', 1)[0])
+        if static_asset is not None:
+            self.serve_static_asset(static_asset)
+            return
+        handler = self.find_route(self._GET_ROUTES, self._GET_PREFIXES)
+        if handler is not None:
+            handler()
+        else:
+            self.send_error(404, "Page not found")
+
+    def do_POST(self):
+        # 持久连接上同一个处理器实例会处理多个请求，每个请求重新记录请求体是否已读取
+        self._body_read = False
+        # 处理API请求
+        handler = self.find_route(self._POST_ROUTES, self._POST_PREFIXES)
+        if handler is not None:
+            handler()
+        elif self.read_json_body() is not None:
+            # 简单的POST处理示例
+            self.send_body('application/json', b'{"status": "success"}')
+        self.discard_unread_body()
+    
+    def discard_unread_body(self):
+        """丢弃处理方法未读取的请求体，否则它会留在持久连接上被当作下一个请求解析；
+        无法确定请求体长度时关闭连接"""
+        if self._body_read:
+            return
+        if self.headers.get('Transfer-Encoding') is not None:
+            self.close_connection = True
+            return
+        content_length = self.headers.get('Content-Length')
+        if content_length is None:
+            return
+        if content_length.isdigit() and int(content_length) <= MAX_BODY:
+            self.rfile.read(int(content_length))
+        else:
+            self.close_connection = True
+    
+    def read_json_body(self):
+        """读取并解析JSON请求体，请求不合法时直接发送错误响应
+        :return: 解析后的JSON对象，出错时返回None（错误响应已发送）
+        """
+        content_length = self.headers.get('Content-Length')
+        if content_length is None:
+            self.send_error(411, "Length Required")
+            return None
+        try:
+            content_length = int(content_length)
+        except ValueError:
+            self.send_error(400, "Invalid Content-Length")
+            return None
+        if content_length < 0:
+            self.send_error(400, "Invalid Content-Length")
+            return None
+        if content_length > MAX_BODY:
+            self.send_error(413, "Request body too large")
+            return None
+        
+        body = self.rfile.read(content_length)
+        self._body_read = True
+        try:
+            request_data = json.loads(body)
+        except ValueError:
+            self.send_error(400, "Invalid JSON body")
+            return None
+        if not isinstance(request_data, dict):
+            self.send_error(400, "JSON body must be an object")
+            return None
+        return request_data
+    
+    def serve_copilot_api(self):
+        """处理Copilot API请求"""
+        # 读取请求数据
+        request_data = self.read_json_body()
+        if request_data is None:
+            return
+        
+        try:
+            # 获取请求路径和方法
+            api_method = self.path.split('/')[-1]
+            
+            # 根据API方法处理请求
+            if api_method == 'chat':
+                # 处理聊天请求
+                message = request_data.get('message', '')
+                
+                # 通过API注册表获取Copilot的聊天处理函数
+                if api_registry is not None and hasattr(self.server, 'plugin_loader'):
+                    # 调用Copilot的聊天处理函数
+                    handle_chat_func = api_registry.get_api("Copilot", "handle_chat")
+                    if handle_chat_func:
+                        response = handle_chat_func(message)
+                        
+                        # 发送响应
+                        self.send_json(response)
+                    else:
+                        # Copilot聊天处理器未找到
+                        self.send_body('application/json', ERR_NO_CHAT_HANDLER, status=404)
+                else:
+                    # API注册表不可用
+                    self.send_body('application/json', ERR_NO_API_REGISTRY, status=500)
+            else:
+                # 未知API方法
+                self.send_body('application/json', ERR_UNKNOWN_API_METHOD, status=404)
+        except Exception as e:
+            # 错误处理
+            error_response = {"error": f"处理请求时出错: {str(e)}"}
+            self.send_json(error_response, status=500)
+
+    def serve_html(self):
+        # 每次请求时动态获取最新的插件信息
+        plugins_info = self.get_plugins_info()
+        
+        # 服务器已运行的天数，跨天时页面缓存随之失效
+        start_time = getattr(self.server, 'start_time', None)
+        uptime_days = int((time.monotonic() - start_time) // 86400) if start_time is not None else 0
+        
+        # 注册表、插件列表和运行天数都未变化时直接返回缓存的页面
+        cache_key = (
+            WebInterfaceHandler._registry_version,
+            tuple((plugin['name'], plugin['developer'], plugin['version']) for plugin in plugins_info),
+            uptime_days
+        )
+        html_cache = WebInterfaceHandler._html_cache
+        if html_cache is None or html_cache[0] != cache_key:
+            html_bytes = self.render_html(plugins_info, uptime_days).encode('utf-8')
+            html_cache = (cache_key, html_bytes, gzip_body(html_bytes))
+            WebInterfaceHandler._html_cache = html_cache
+        
+        self.send_body('text/html; charset=utf-8', html_cache[1], html_cache[2])
+
+    def render_html(self, plugins_info, uptime_days=0):
+        """渲染完整的页面HTML
+        :param plugins_info: 插件信息列表
+        :param uptime_days: 服务器已运行的天数
+        :return: 页面HTML字符串
+        """
+        # 动态生成菜单项HTML
+        menu_items_html = self.generate_menu_items()
+        plugin_cards_html = self.generate_plugin_cards(plugins_info)
+        plugin_count = len(plugins_info)
+        
+        # 动态获取插件CSS内容
+        plugin_css = self.get_plugin_contents_by_position('head', 'css')
+        # 动态获取插件head中的HTML内容（如外部样式表链接）
+        plugin_head_html = self.get_plugin_contents_by_position('head', 'html')
+        # 动态获取插件HTML内容
+        plugin_html = self.get_plugin_contents_by_position('body', 'html')
+        # 动态获取插件JS内容
+        plugin_js = self.get_plugin_contents_by_position('body', 'js')
+        
+        return _PAGE_TEMPLATE.substitute(
+            plugin_css=plugin_css,
+            plugin_head_html=plugin_head_html,
+            menu_items_html=menu_items_html,
+            plugin_count=plugin_count,
+            uptime_days=uptime_days,
+            plugin_cards_html=plugin_cards_html,
+            plugin_html=plugin_html,
+            plugin_js=plugin_js
+        )
+
+class PooledHTTPServer(ThreadingHTTPServer):
+    """并发处理请求的HTTP服务器，请求交给有界线程池执行而不是每个连接新建线程"""
+    daemon_threads = True
+    
+    def __init__(self, server_address, handler_class, max_workers=32):
+        super().__init__(server_address, handler_class)
+        # 服务器启动时间，用于页面显示运行天数
+        self.start_time = time.monotonic()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='web-request')
+        # 插件事件流的广播中心，SSE连接由它统一推送
+        self.event_hub = PluginEventHub(self)
+    
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+    
+    def shutdown_request(self, request):
+        # 已交给事件广播线程的SSE连接由广播线程负责关闭
+        if self.event_hub.owns(request):
+            return
+        super().shutdown_request(request)
+    
+    def server_close(self):
+        super().server_close()
+        self.event_hub.close()
+        self.executor.shutdown(wait=False)
+
+class PluginEventHub:
+    """插件事件流广播中心
+    所有SSE连接由单个广播线程以非阻塞方式推送，长连接不再各自占用一个工作线程
+    """
+    
+    def __init__(self, server):
+        self.server = server
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.thread = None
+        # 广播线程最近一次推送的插件列表版本
+        self.sent_version = None
+    
+    def subscribe(self, sock):
+        """接管一个已发送响应头的SSE连接，先推送当前插件信息
+        :param sock: 客户端套接字
+        """
+        sock.setblocking(False)
+        with self.lock:
+            plugins_cache = WebInterfaceHandler.get_plugins_info_cache(getattr(self.server, 'plugin_loader', None))
+            if not self.send(sock, b'data: ' + plugins_cache[2] + b'\n\n'):
+                sock.close()
+                return
+            self.clients.add(sock)
+            if self.thread is None:
+                self.sent_version = plugins_cache[0]
+                self.thread = threading.Thread(target=self.run, name='web-plugin-events', daemon=True)
+                self.thread.start()
+    
+    def owns(self, sock):
+        """判断套接字是否已由广播中心接管"""
+        return sock in self.clients
+    
+    def send(self, sock, payload):
+        """非阻塞发送一条事件，发送缓冲区已满或连接已断开时返回False"""
+        try:
+            return sock.send(payload) == len(payload)
+        except OSError:
+            return False
+    
+    def run(self):
+        """广播循环：插件列表变化时推送新数据，否则定期发送心跳以清理断开的连接"""
+        # 主线程结束后退出
+        while threading.main_thread().is_alive():
+            try:
+                self.broadcast()
+            except Exception as e:
+                # 单次广播出错不能结束广播线程，否则所有SSE客户端都会静默地停止更新
+                print(f"插件事件广播出错: {e}")
+                time.sleep(SSE_KEEPALIVE_INTERVAL)
+    
+    def broadcast(self):
+        """等待插件列表变化或心跳间隔，然后向所有客户端推送一次"""
+        plugin_loader = getattr(self.server, 'plugin_loader', None)
+        if hasattr(plugin_loader, 'wait_for_change'):
+            plugin_loader.wait_for_change(self.sent_version[1], SSE_KEEPALIVE_INTERVAL)
+        else:
+            time.sleep(SSE_KEEPALIVE_INTERVAL)
+        
+        with self.lock:
+            plugins_cache = WebInterfaceHandler.get_plugins_info_cache(plugin_loader)
+            if plugins_cache[0] != self.sent_version:
+                self.sent_version = plugins_cache[0]
+                payload = b'data: ' + plugins_cache[2] + b'\n\n'
+            else:
+                payload = b': keep-alive\n\n'
+            # 推送失败的客户端直接断开，浏览器的EventSource会自动重连
+            for sock in [sock for sock in self.clients if not self.send(sock, payload)]:
+                self.clients.discard(sock)
+                sock.close()
+    
+    def close(self):
+        """关闭所有SSE连接"""
+        with self.lock:
+            for sock in self.clients:
+                sock.close()
+            self.clients.clear()
+
+# Web服务配置文件及默认配置
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'config.json')
+DEFAULT_CONFIG = {'host': '0.0.0.0', 'port': 6099, 'workers': 32}
+
+def load_config():
+    """读取Web服务配置文件，缺失的项使用默认值
+    :return: 配置字典 {'host', 'port', 'workers'}
+    """
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
             config = json.load(f)
-        host = config.get('host', '0.0.0.0')
-        port = config.get('port', 6099)
     except Exception as e:
         print(f"警告: 无法读取配置文件，使用默认设置: {e}")
-        host = '0.0.0.0'
-        port = 6099
+        return dict(DEFAULT_CONFIG)
+    return {key: config.get(key, default) for key, default in DEFAULT_CONFIG.items()}
+
+# 导入时读取一次配置，修改后需重启生效（监听地址和线程池无法在运行中更换）
+CONFIG = load_config()
+
+def run_web_server(plugin_loader):
+    config = CONFIG
+    host = config['host']
+    port = config['port']
+    workers = config['workers']
     
     server_address = (host, port)
-    httpd = HTTPServer(server_address, WebInterfaceHandler)
+    httpd = PooledHTTPServer(server_address, WebInterfaceHandler, max_workers=workers)
     # 将plugin_loader传递给服务器实例
     httpd.plugin_loader = plugin_loader
     print(f"启动Web管理界面...")
@@ -881,9 +1515,15 @@ def start_plugin(api_registry, plugin_loader):
     if api_registry is not None:
         api_registry.register_api("WebPlatform", "register_menu_item", WebInterfaceHandler.register_menu_item, show_output=False)
         api_registry.register_api("WebPlatform", "register_plugin_content", WebInterfaceHandler.register_plugin_content, show_output=False)
+        api_registry.register_api("WebPlatform", "register_plugin_contents", WebInterfaceHandler.register_plugin_contents, show_output=False)
+        api_registry.register_api("WebPlatform", "register_static_asset", WebInterfaceHandler.register_static_asset, show_output=False)
+        api_registry.register_api("WebPlatform", "register_icon", WebInterfaceHandler.register_icon, show_output=False)
     else:
         print("警告: API注册表不可用，部分功能可能无法正常工作")
     
+    # 发布内置图标的精灵图
+    WebInterfaceHandler.publish_icon_sprite()
+    
     # 启动Web服务器
     web_thread = threading.Thread(target=run_web_server, args=(plugin_loader,), daemon=True)
     web_thread.start()
\ No newline at end of file
@@ -1,16 +1,30 @@
 import os
 import json
+import hashlib
+import itertools
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import threading
-import time
 import toml
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Callable, Optional, List
 from src.logger import get_logger
+from src.json_utils import json_dumps
 
 logger = get_logger()
 
+# 请求和工具调用ID：进程号前缀加自增计数，多线程下也不会重复
+_id_prefix = f"{os.getpid():x}"
+_request_counter = itertools.count()
+_tool_call_counter = itertools.count()
+
 class AIProvider:
     """AI提供商基类"""
+    # 日志中显示的提供商名称
+    display_name = "AI"
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.name = config.get('name', '')
@@ -20,6 +34,72 @@ class AIProvider:
         self.max_retry = config.get('max_retry', 2)
         self.timeout = config.get('timeout', 120)
         self.retry_interval = config.get('retry_interval', 10)
+        # 复用连接的HTTP会话，避免每次请求重新建立TCP和TLS连接
+        # 连接错误和临时性状态码由适配器按指数退避重试，429响应优先遵循Retry-After
+        self.session = requests.Session()
+        retry = Retry(
+            total=self.max_retry,
+            backoff_factor=self.retry_interval,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['POST']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=20, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # 请求体统一以预先序列化的JSON字节发送
+        self.session.headers['Content-Type'] = 'application/json'
+    
+    def _post_json(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        发送JSON请求并解析响应，临时性错误的重试已由会话适配器完成
+        :param url: 请求地址
+        :param payload: 请求载荷
+        :return: 解析后的响应，失败时返回包含error的字典
+        """
+        logger.debug("发送%s请求到: %s", args=(self.display_name, url))
+        logger.debug("请求载荷: %r", args=(payload,))
+        try:
+            response = self.session.post(
+                url,
+                data=json_dumps(payload),
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            return self._parse_json_body(response)
+        except Exception as e:
+            logger.error(f"{self.display_name}请求失败: {e}")
+            return {"error": str(e)}
+    
+    def close(self):
+        """关闭HTTP会话，释放连接池中的连接"""
+        self.session.close()
+    
+    def _parse_json_body(self, response) -> Dict[str, Any]:
+        """校验并解析响应体，直接在原始字节上检查和解析，正常情况下不生成完整的文本副本"""
+        content = response.content
+        logger.debug("收到响应，长度: %d 字节", args=(len(content),))
+        
+        # 检查响应内容是否为空
+        if not content or content.isspace():
+            raise ValueError("API返回空响应")
+        
+        # 检查是否是HTML响应
+        if content[:64].lstrip().lower().startswith((b'<!doctype', b'<html')):
+            logger.error(f"{self.display_name} API返回HTML页面而不是JSON响应，这通常是URL错误或服务不可用")
+            logger.error(f"响应内容预览: {content[:200].decode('utf-8', 'replace')}...")
+            raise ValueError("API返回HTML页面而不是JSON响应")
+        
+        # 尝试解析JSON，json.loads可直接处理UTF-8字节
+        try:
+            response_json = json.loads(content)
+        except ValueError:
+            # 只记录前500个字节
+            logger.error(f"{self.display_name} API返回非JSON格式响应: {content[:500].decode('utf-8', 'replace')}")
+            raise
+        logger.debug("成功解析JSON响应")
+        return response_json
     
     def send_request(self, messages: list, tools: Optional[list] = None, model_identifier: str = "") -> Dict[str, Any]:
         """发送请求到AI模型"""
@@ -31,73 +111,38 @@ class AIProvider:
 
 class OpenAIProvider(AIProvider):
     """OpenAI提供商实现"""
-    def send_request(self, messages: list, tools: Optional[list] = None, model_identifier: str = "") -> Dict[str, Any]:
-        """发送请求到OpenAI模型"""
-        headers = {
+    display_name = "OpenAI"
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        # 请求头在会话上设置一次，之后每个请求复用
+        self.session.headers.update({
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
-        }
-        
+        })
+        # 额外参数来自配置，初始化时整理一次
+        extra_params = self.config.get('extra_params', {})
+        self._extra_payload = {}
+        if 'temperature' in extra_params:
+            self._extra_payload["temperature"] = extra_params['temperature']
+        if 'max_tokens' in extra_params:
+            self._extra_payload["max_tokens"] = extra_params['max_tokens']
+    
+    def send_request(self, messages: list, tools: Optional[list] = None, model_identifier: str = "") -> Dict[str, Any]:
+        """发送请求到OpenAI模型"""
         payload = {
             "model": model_identifier,
             "messages": messages,
         }
         
         # 添加额外参数
-        extra_params = self.config.get('extra_params', {})
-        if 'temperature' in extra_params:
-            payload["temperature"] = extra_params['temperature']
-        if 'max_tokens' in extra_params:
-            payload["max_tokens"] = extra_params['max_tokens']
+        payload.update(self._extra_payload)
         
         if tools:
             payload["tools"] = tools
             payload["tool_choice"] = "auto"
         
-        # 重试机制
-        for attempt in range(self.max_retry + 1):
-            try:
-                url = f"{self.base_url}/chat/completions"
-                logger.debug(f"发送OpenAI请求到: {url}")
-                logger.debug(f"请求载荷: {payload}")
-                
-                response = requests.post(
-                    url,
-                    headers=headers,
-                    json=payload,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                
-                # 检查响应内容是否为空
-                response_text = response.text
-                logger.debug(f"收到响应，长度: {len(response_text)} 字符")
-                
-                if not response_text or response_text.strip() == '':
-                    raise ValueError("API返回空响应")
-                
-                # 检查是否是HTML响应
-                if response_text.strip().startswith('<!doctype') or response_text.strip().startswith('<html'):
-                    logger.error(f"OpenAI API返回HTML页面而不是JSON响应，这通常是URL错误或服务不可用")
-                    logger.error(f"响应内容预览: {response_text[:200]}...")
-                    raise ValueError("API返回HTML页面而不是JSON响应")
-                
-                # 尝试解析JSON
-                try:
-                    response_json = response.json()
-                    logger.debug(f"成功解析JSON响应")
-                    return response_json
-                except ValueError as e:
-                    logger.error(f"OpenAI API返回非JSON格式响应: {response_text[:500]}")  # 只记录前500个字符
-                    raise e
-                
-            except Exception as e:
-                if attempt < self.max_retry:
-                    logger.warning(f"OpenAI请求失败，{self.retry_interval}秒后重试 (尝试 {attempt + 1}/{self.max_retry + 1}): {e}")
-                    time.sleep(self.retry_interval)
-                else:
-                    logger.error(f"OpenAI请求失败: {e}")
-                    return {"error": str(e)}
+        return self._post_json(f"{self.base_url}/chat/completions", payload)
     
     def parse_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
         """解析OpenAI模型的响应"""
@@ -136,6 +181,29 @@ class OpenAIProvider(AIProvider):
 
 class GeminiProvider(AIProvider):
     """Gemini提供商实现"""
+    display_name = "Gemini"
+    
+    def __init__(self, config: Dict[str, Any]):
+        super().__init__(config)
+        # 根据base_url格式确定正确的API端点，只在初始化时计算一次
+        if "/v1beta/" in self.base_url or self.base_url.endswith("/v1beta"):
+            # 标准Google API格式
+            self._models_url = f"{self.base_url}/models"
+        elif "/v1/" in self.base_url or self.base_url.endswith("/v1"):
+            # OpenAI兼容格式（如果适用）
+            self._models_url = f"{self.base_url}/models"
+        else:
+            # 中间商API格式，需要添加版本路径
+            self._models_url = f"{self.base_url.rstrip('/')}/v1beta/models"
+        
+        # 额外参数来自配置，初始化时转换为generationConfig
+        extra_params = self.config.get('extra_params', {})
+        self._generation_config = {}
+        if 'temperature' in extra_params:
+            self._generation_config['temperature'] = extra_params['temperature']
+        if 'max_tokens' in extra_params:
+            self._generation_config['maxOutputTokens'] = extra_params['max_tokens']
+    
     def send_request(self, messages: list, tools: Optional[list] = None, model_identifier: str = "") -> Dict[str, Any]:
         """发送请求到Gemini模型"""
         # 转换消息格式为Gemini格式
@@ -158,75 +226,14 @@ class GeminiProvider(AIProvider):
         }
         
         # 添加额外参数
-        extra_params = self.config.get('extra_params', {})
-        if 'temperature' in extra_params:
-            if 'generationConfig' not in payload:
-                payload['generationConfig'] = {}
-            payload['generationConfig']['temperature'] = extra_params['temperature']
-        if 'max_tokens' in extra_params:
-            if 'generationConfig' not in payload:
-                payload['generationConfig'] = {}
-            payload['generationConfig']['maxOutputTokens'] = extra_params['max_tokens']
+        if self._generation_config:
+            payload['generationConfig'] = self._generation_config
         
         if tools:
             payload["tools"] = [{"functionDeclarations": tools}]
         
-        # 重试机制
-        for attempt in range(self.max_retry + 1):
-            try:
-                # 根据base_url格式确定正确的API端点
-                if "/v1beta/" in self.base_url or self.base_url.endswith("/v1beta"):
-                    # 标准Google API格式
-                    url = f"{self.base_url}/models/{model_identifier}:generateContent?key={self.api_key}"
-                elif "/v1/" in self.base_url or self.base_url.endswith("/v1"):
-                    # OpenAI兼容格式（如果适用）
-                    url = f"{self.base_url}/models/{model_identifier}:generateContent?key={self.api_key}"
-                else:
-                    # 中间商API格式，可能需要添加版本路径
-                    if self.base_url.endswith("/"):
-                        url = f"{self.base_url}v1beta/models/{model_identifier}:generateContent?key={self.api_key}"
-                    else:
-                        url = f"{self.base_url}/v1beta/models/{model_identifier}:generateContent?key={self.api_key}"
-                
-                logger.debug(f"发送Gemini请求到: {url}")
-                logger.debug(f"请求载荷: {payload}")
-                
-                response = requests.post(
-                    url,
-                    json=payload,
-                    timeout=self.timeout
-                )
-                response.raise_for_status()
-                
-                # 检查响应内容是否为空
-                response_text = response.text
-                logger.debug(f"收到响应，长度: {len(response_text)} 字符")
-                
-                if not response_text or response_text.strip() == '':
-                    raise ValueError("API返回空响应")
-                
-                # 检查是否是HTML响应
-                if response_text.strip().startswith('<!doctype') or response_text.strip().startswith('<html'):
-                    logger.error(f"Gemini API返回HTML页面而不是JSON响应，这通常是URL错误或服务不可用")
-                    logger.error(f"响应内容预览: {response_text[:200]}...")
-                    raise ValueError("API返回HTML页面而不是JSON响应")
-                
-                # 尝试解析JSON
-                try:
-                    response_json = response.json()
-                    logger.debug(f"成功解析JSON响应")
-                    return response_json
-                except ValueError as e:
-                    logger.error(f"Gemini API返回非JSON格式响应: {response_text[:500]}")  # 只记录前500个字符
-                    raise e
-                
-            except Exception as e:
-                if attempt < self.max_retry:
-                    logger.warning(f"Gemini请求失败，{self.retry_interval}秒后重试 (尝试 {attempt + 1}/{self.max_retry + 1}): {e}")
-                    time.sleep(self.retry_interval)
-                else:
-                    logger.error(f"Gemini请求失败: {e}")
-                    return {"error": str(e)}
+        url = f"{self._models_url}/{model_identifier}:generateContent?key={self.api_key}"
+        return self._post_json(url, payload)
     
     def parse_response(self, response: Dict[str, Any]) -> Dict[str, Any]:
         """解析Gemini模型的响应"""
@@ -246,25 +253,25 @@ class GeminiProvider(AIProvider):
             
             content_parts = candidate["content"]["parts"]
             
-            # 合并所有文本部分
-            content_text = ""
+            # 收集所有文本部分，最后一次性合并
+            text_parts = []
             tool_calls = []
             
             for part in content_parts:
                 if "text" in part:
-                    content_text += part["text"]
+                    text_parts.append(part["text"])
                 elif "functionCall" in part:
                     tool_calls.append({
-                        "id": f"call_{int(time.time() * 1000000)}",
+                        "id": f"call_{_id_prefix}_{next(_tool_call_counter):x}",
                         "type": "function",
                         "function": {
                             "name": part["functionCall"]["name"],
-                            "arguments": json.dumps(part["functionCall"].get("args", {}))
+                            "arguments": json_dumps(part["functionCall"].get("args", {})).decode('utf-8')
                         }
                     })
             
             result = {
-                "content": content_text,
+                "content": "".join(text_parts),
                 "role": "assistant"
             }
             
@@ -281,29 +288,18 @@ class GeminiProvider(AIProvider):
 
 class AIManager:
     """AI管理器"""
-    _instance = None
-    _lock = threading.Lock()
-    
-    def __new__(cls, config_path=None):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(AIManager, cls).__new__(cls)
-                    cls._instance._initialized = False
-                    cls._instance._init_config_path = config_path
-        return cls._instance
     
     def __init__(self, config_path=None):
-        if self._initialized:
-            return
-        
-        self._initialized = True
-        # 使用初始化时传递的配置路径，或者使用__new__时保存的路径
-        actual_config_path = config_path or getattr(self, '_init_config_path', None)
-        self.config = self._load_config(actual_config_path)
+        # 创建或最近一次重新加载时传入的配置文件路径
+        self.config_path = config_path
+        self.config = self._load_config(config_path)
+        # 重新加载配置时持有，避免并发重载交错执行
+        self._config_lock = threading.Lock()
         self.providers = {}
         self.models = {}
         self.model_task_config = {}
+        # 模型路由表：模型名称 -> (提供商名称, 提供商实例, 模型标识符)
+        self._routes = {}
         
         # 初始化提供商
         self._init_providers()
@@ -311,10 +307,46 @@ class AIManager:
         self._init_models()
         # 初始化任务配置
         self._init_task_config()
+        # 解析模型路由
+        self._build_routes()
         
         self.request_queue = []
+        # 进行中的请求 request_id -> Future，完成后自动移除
         self.response_callbacks = {}
-        self.message_listeners = []
+        # 监听器元组，注册时整体替换（写时复制），分发时无需加锁
+        self.message_listeners = ()
+        self._listener_lock = threading.Lock()
+        # 请求线程池，限制同时进行的AI请求数量并复用线程
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.config.get('max_concurrent_requests', 8),
+            thread_name_prefix='ai-req'
+        )
+        # 响应缓存：请求哈希 -> 解析后的响应，相同的(模型, 消息, 工具)直接返回，不再请求API
+        self._response_cache = OrderedDict()
+        self._response_cache_size = self.config.get('response_cache_size', 512)
+        self._cache_lock = threading.Lock()
+    
+    def reload_config(self, config_path=None):
+        """
+        重新加载配置文件并重建提供商、模型、任务配置和路由表，旧提供商的HTTP会话随之关闭，响应缓存清空
+        :param config_path: 配置文件路径
+        """
+        with self._config_lock:
+            old_providers = self.providers
+            self.config_path = config_path
+            self.config = self._load_config(config_path)
+            self.providers = {}
+            self.models = {}
+            self._init_providers()
+            self._init_models()
+            self._init_task_config()
+            self._build_routes()
+            # 模型可能已指向其他提供商，旧的缓存响应不再可信
+            with self._cache_lock:
+                self._response_cache_size = self.config.get('response_cache_size', 512)
+                self._response_cache.clear()
+        for provider in old_providers.values():
+            provider.close()
     
     def _load_config(self, config_path=None) -> Dict[str, Any]:
         """加载配置文件"""
@@ -372,9 +404,22 @@ class AIManager:
         """初始化任务配置"""
         self.model_task_config = self.config.get("model_task_config", {})
     
+    def _build_routes(self):
+        """预先解析每个模型对应的提供商和模型标识符，配置错误在加载时即可发现"""
+        routes = {}
+        for model_name, model_config in self.models.items():
+            api_provider_name = model_config.get("api_provider")
+            provider = self.providers.get(api_provider_name)
+            if provider is None:
+                logger.warning(f"模型 {model_name} 的API提供商 {api_provider_name} 不存在")
+                continue
+            routes[model_name] = (api_provider_name, provider, model_config.get("model_identifier"))
+        self._routes = routes
+    
     def register_message_listener(self, listener: Callable[[str, Dict[str, Any]], None]):
         """注册消息监听器"""
-        self.message_listeners.append(listener)
+        with self._listener_lock:
+            self.message_listeners = self.message_listeners + (listener,)
     
     def send_message(self, message_type: str, data: Dict[str, Any]):
         """发送消息给所有监听器"""
@@ -385,59 +430,68 @@ class AIManager:
                 logger.error(f"消息监听器处理失败: {e}")
     
     def send_request(self, model_name: str, messages: list, tools: Optional[list] = None, 
-                     request_id: Optional[str] = None) -> str:
-        """发送AI请求"""
+                     request_id: Optional[str] = None,
+                     callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     use_cache: bool = True) -> str:
+        """发送AI请求
+        :param callback: 可选的回调函数，提供时响应只交给该回调，不再广播给消息监听器
+        :param use_cache: 为False时既不读取也不写入响应缓存，总是请求模型
+        """
         if request_id is None:
-            request_id = f"req_{int(time.time() * 1000000)}"
+            request_id = f"req_{_id_prefix}_{next(_request_counter):x}"
         
-        # 异步发送请求
-        thread = threading.Thread(
-            target=self._async_send_request,
-            args=(model_name, messages, tools, request_id),
-            daemon=True
-        )
-        thread.start()
+        # 提交到线程池异步发送请求
+        future = self._executor.submit(self._async_send_request, model_name, messages, tools, request_id, callback, use_cache)
+        self.response_callbacks[request_id] = future
+        future.add_done_callback(lambda _: self.response_callbacks.pop(request_id, None))
         
         return request_id
     
+    def cancel_request(self, request_id: str) -> bool:
+        """取消尚未开始执行的AI请求
+        :return: 是否成功取消
+        """
+        future = self.response_callbacks.get(request_id)
+        return future is not None and future.cancel()
+    
+    def shutdown(self):
+        """关闭请求线程池，排队中的请求将被取消"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+    
     def _async_send_request(self, model_name: str, messages: list, tools: Optional[list], 
-                            request_id: str):
+                            request_id: str,
+                            callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                            use_cache: bool = True):
         """异步发送AI请求"""
         try:
-            # 查找模型配置
-            if model_name not in self.models:
-                error_msg = f"未找到模型: {model_name}"
-                logger.error(error_msg)
-                self.send_message("ai_response", {
-                    "request_id": request_id,
-                    "error": error_msg
-                })
-                return
-            
-            model_config = self.models[model_name]
-            api_provider_name = model_config.get("api_provider")
-            model_identifier = model_config.get("model_identifier")
-            
-            # 查找提供商
-            if api_provider_name not in self.providers:
-                error_msg = f"未找到API提供商: {api_provider_name}"
+            route = self._routes.get(model_name)
+            if route is None:
+                if model_name not in self.models:
+                    error_msg = f"未找到模型: {model_name}"
+                else:
+                    error_msg = f"未找到API提供商: {self.models[model_name].get('api_provider')}"
                 logger.error(error_msg)
-                self.send_message("ai_response", {
+                self._deliver_response(callback, {
                     "request_id": request_id,
                     "error": error_msg
                 })
                 return
             
-            provider = self.providers[api_provider_name]
+            api_provider_name, provider, model_identifier = route
             
-            # 发送请求
-            response = provider.send_request(messages, tools, model_identifier)
-            
-            # 解析响应
-            parsed_response = provider.parse_response(response)
+            # 命中响应缓存时直接返回
+            cache_key = self._response_cache_key(model_name, messages, tools) if use_cache else None
+            parsed_response = self._get_cached_response(cache_key)
+            if parsed_response is None:
+                # 发送请求
+                response = provider.send_request(messages, tools, model_identifier)
+                
+                # 解析响应
+                parsed_response = provider.parse_response(response)
+                self._store_cached_response(cache_key, parsed_response)
             
             # 发送响应消息
-            self.send_message("ai_response", {
+            self._deliver_response(callback, {
                 "request_id": request_id,
                 "model": model_name,
                 "provider": api_provider_name,
@@ -445,11 +499,53 @@ class AIManager:
             })
         except Exception as e:
             logger.error(f"AI请求处理失败: {e}")
-            self.send_message("ai_response", {
+            self._deliver_response(callback, {
                 "request_id": request_id,
                 "error": str(e)
             })
     
+    def _response_cache_key(self, model_name: str, messages: list, tools: Optional[list]) -> Optional[bytes]:
+        """计算请求的缓存键，缓存关闭或请求无法序列化时返回None"""
+        if self._response_cache_size <= 0:
+            return None
+        try:
+            serialized = json_dumps([model_name, messages, tools], sort_keys=True)
+        except (TypeError, ValueError):
+            return None
+        return hashlib.blake2b(serialized, digest_size=16).digest()
+    
+    def _get_cached_response(self, cache_key: Optional[bytes]) -> Optional[Dict[str, Any]]:
+        """查找缓存的响应，命中时返回副本"""
+        if cache_key is None:
+            return None
+        with self._cache_lock:
+            cached = self._response_cache.get(cache_key)
+            if cached is None:
+                return None
+            self._response_cache.move_to_end(cache_key)
+        logger.debug("AI响应缓存命中")
+        return dict(cached)
+    
+    def _store_cached_response(self, cache_key: Optional[bytes], parsed_response: Dict[str, Any]):
+        """缓存成功的响应，出错或包含工具调用的响应不缓存"""
+        if cache_key is None or "error" in parsed_response or "tool_calls" in parsed_response:
+            return
+        with self._cache_lock:
+            self._response_cache[cache_key] = dict(parsed_response)
+            self._response_cache.move_to_end(cache_key)
+            while len(self._response_cache) > self._response_cache_size:
+                self._response_cache.popitem(last=False)
+    
+    def _deliver_response(self, callback: Optional[Callable[[Dict[str, Any]], None]], data: Dict[str, Any]):
+        """将响应交给请求方的回调，未提供回调时广播给所有消息监听器"""
+        if callback is None:
+            self.send_message("ai_response", data)
+            return
+        try:
+            callback(data)
+        except Exception as e:
+            logger.error(f"AI响应回调处理失败: {e}")
+    
     def get_available_models(self) -> List[str]:
         """获取可用模型列表"""
         return list(self.models.keys())
@@ -472,24 +568,27 @@ class AIManager:
 
 # 全局AI管理器实例
 ai_manager = None
+_ai_manager_lock = threading.Lock()
 
 def get_ai_manager(config_path=None):
-    """获取全局AI管理器实例"""
+    """
+    获取全局AI管理器实例
+    :param config_path: 首次创建实例时使用的配置文件路径；实例已存在时忽略，需要重新加载请调用reload_config
+    :return: AI管理器实例
+    """
     global ai_manager
     if ai_manager is None:
-        ai_manager = AIManager(config_path)
-    elif config_path:
-        # 如果AI管理器已经存在并且提供了新的配置路径，则重新加载配置
-        ai_manager.config = ai_manager._load_config(config_path)
-        ai_manager._init_providers()
-        ai_manager._init_models()
-        ai_manager._init_task_config()
+        with _ai_manager_lock:
+            if ai_manager is None:
+                ai_manager = AIManager(config_path)
     return ai_manager
 
 def send_ai_request(model_name: str, messages: list, tools: Optional[list] = None, 
-                    request_id: Optional[str] = None) -> str:
+                    request_id: Optional[str] = None,
+                    callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    use_cache: bool = True) -> str:
     """发送AI请求的便捷函数"""
-    return ai_manager.send_request(model_name, messages, tools, request_id)
+    return ai_manager.send_request(model_name, messages, tools, request_id, callback, use_cache)
 
 def register_ai_message_listener(listener: Callable[[str, Dict[str, Any]], None]):
     """注册AI消息监听器的便捷函数"""
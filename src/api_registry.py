@@ -3,6 +3,8 @@ from src.file_api import FileAPI
 class APIRegistry:
     def __init__(self):
         self.apis = {}
+        # (插件名称, API名称) -> API函数，用于单次查找
+        self._flat_apis = {}
         # 初始化时注册系统级API
         self._register_system_apis()
 
@@ -28,13 +30,12 @@ class APIRegistry:
             self.apis[plugin_name] = {}
         
         self.apis[plugin_name][api_name] = api_function
+        self._flat_apis[(plugin_name, api_name)] = api_function
         if show_output:
             print(f"API registered: {plugin_name}.{api_name}")
 
     def get_api(self, plugin_name, api_name):
-        if plugin_name in self.apis and api_name in self.apis[plugin_name]:
-            return self.apis[plugin_name][api_name]
-        return None
+        return self._flat_apis.get((plugin_name, api_name))
 
     def list_apis(self, plugin_name=None):
         if plugin_name:
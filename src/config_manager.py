@@ -1,5 +1,8 @@
 import os
 import json
+import shutil
+import tempfile
+import threading
 from typing import Dict, Any
 
 class ConfigManager:
@@ -7,7 +10,12 @@ class ConfigManager:
         self.config_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), config_dir)
         self.config_file = os.path.join(self.config_dir, "config.json")
         self.config = {}
+        # 点分隔键 -> 配置值的扁平索引，get直接查表而不必逐层遍历
+        self._flat = {}
+        # 串行化配置保存，并发保存时不会交错写入和替换
+        self._save_lock = threading.Lock()
         self._load_config()
+        self._build_index()
     
     def _load_config(self):
         """加载配置文件"""
@@ -34,30 +42,57 @@ class ConfigManager:
         self._save_config()
     
     def _save_config(self):
-        """保存配置文件"""
+        """保存配置文件，先写入临时文件再替换，写入中途出错不会损坏原配置"""
         try:
             # 确保配置目录存在
-            if not os.path.exists(self.config_dir):
-                os.makedirs(self.config_dir)
+            os.makedirs(self.config_dir, exist_ok=True)
             
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, ensure_ascii=False, indent=4)
+            with self._save_lock:
+                # 每次保存使用唯一的临时文件，与配置文件同目录以保证os.replace是原子替换
+                fd, tmp_file = tempfile.mkstemp(dir=self.config_dir, prefix='config.', suffix='.tmp')
+                try:
+                    with open(fd, 'w', encoding='utf-8') as f:
+                        json.dump(self.config, f, ensure_ascii=False, indent=4)
+                    # mkstemp创建的文件仅所有者可读写，沿用原配置文件的权限
+                    if os.path.exists(self.config_file):
+                        shutil.copymode(self.config_file, tmp_file)
+                    os.replace(tmp_file, self.config_file)
+                except BaseException:
+                    os.unlink(tmp_file)
+                    raise
         except Exception as e:
             print(f"警告: 无法保存配置文件: {e}")
     
+    def _build_index(self):
+        """重建点分隔键的扁平索引，子树和叶子节点都会被收录"""
+        flat = {}
+        self._flatten('', self.config, flat)
+        self._flat = flat
+    
+    def _flatten(self, prefix: str, node: Dict[str, Any], flat: Dict[str, Any]):
+        """递归展开配置字典
+        :param prefix: 当前节点的键前缀
+        :param node: 当前配置节点
+        :param flat: 输出的扁平索引
+        """
+        for k, value in node.items():
+            key = f"{prefix}{k}"
+            flat[key] = value
+            if isinstance(value, dict):
+                self._flatten(f"{key}.", value, flat)
+    
     def get(self, key: str, default: Any = None) -> Any:
         """获取配置项"""
-        keys = key.split('.')
-        value = self.config
-        try:
-            for k in keys:
-                value = value[k]
-            return value
-        except (KeyError, TypeError):
-            return default
+        return self._flat.get(key, default)
     
     def set(self, key: str, value: Any):
         """设置配置项"""
+        self._assign(key, value)
+        self._build_index()
+        self._save_config()
+    
+    def _assign(self, key: str, value: Any):
+        """仅在内存中设置配置项，不重建索引也不保存"""
         keys = key.split('.')
         config = self.config
         for k in keys[:-1]:
@@ -65,7 +100,6 @@ class ConfigManager:
                 config[k] = {}
             config = config[k]
         config[keys[-1]] = value
-        self._save_config()
     
     def get_version(self) -> str:
         """获取当前版本"""
@@ -78,11 +112,15 @@ class ConfigManager:
         return console_level, file_level
     
     def set_log_levels(self, console_level: str = None, file_level: str = None):
-        """设置日志级别"""
+        """设置日志级别，两项一起修改时只保存一次"""
+        if console_level is None and file_level is None:
+            return
         if console_level is not None:
-            self.set("log.console_level", console_level)
+            self._assign("log.console_level", console_level)
         if file_level is not None:
-            self.set("log.file_level", file_level)
+            self._assign("log.file_level", file_level)
+        self._build_index()
+        self._save_config()
 
 # 全局配置管理器实例
 config_manager = ConfigManager()
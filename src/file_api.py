@@ -1,6 +1,22 @@
 import os
 
+# kaos目录，文件API只允许访问该目录内的文件
+BASE_PATH = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+
 class FileAPI:
+    @staticmethod
+    def _check_path(file_path):
+        """
+        解析文件的真实路径并确保其在kaos目录范围内，符号链接也会被解析
+        :param file_path: 文件路径
+        :return: 解析后的绝对路径
+        :raises PermissionError: 路径在kaos目录外时抛出
+        """
+        real_path = os.path.realpath(file_path)
+        if real_path != BASE_PATH and not real_path.startswith(BASE_PATH + os.sep):
+            raise PermissionError("不允许访问kaos目录外的文件")
+        return real_path
+
     @staticmethod
     def read_file(file_path):
         """
@@ -9,13 +25,9 @@ class FileAPI:
         :return: 文件内容字符串，如果出错则返回None
         """
         try:
-            # 确保文件路径在kaos目录范围内
-            abs_path = os.path.abspath(file_path)
-            base_path = os.path.abspath(os.path.dirname(__file__) + "/../")
-            if not abs_path.startswith(base_path):
-                raise PermissionError("不允许访问kaos目录外的文件")
-                
-            with open(file_path, 'r', encoding='utf-8') as file:
+            real_path = FileAPI._check_path(file_path)
+            
+            with open(real_path, 'r', encoding='utf-8') as file:
                 return file.read()
         except Exception as e:
             print(f"读取文件失败 {file_path}: {e}")
@@ -30,16 +42,12 @@ class FileAPI:
         :return: 成功返回True，失败返回False
         """
         try:
-            # 确保文件路径在kaos目录范围内
-            abs_path = os.path.abspath(file_path)
-            base_path = os.path.abspath(os.path.dirname(__file__) + "/../")
-            if not abs_path.startswith(base_path):
-                raise PermissionError("不允许访问kaos目录外的文件")
-                
+            real_path = FileAPI._check_path(file_path)
+            
             # 确保目录存在
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.makedirs(os.path.dirname(real_path), exist_ok=True)
             
-            with open(file_path, 'w', encoding='utf-8') as file:
+            with open(real_path, 'w', encoding='utf-8') as file:
                 file.write(content)
             return True
         except Exception as e:
@@ -56,16 +64,20 @@ class FileAPI:
         :return: 成功返回True，失败返回False
         """
         try:
-            # 读取文件
-            content = FileAPI.read_file(file_path)
-            if content is None:
-                return False
+            real_path = FileAPI._check_path(file_path)
             
-            # 替换内容
-            updated_content = content.replace(old_content, new_content)
-            
-            # 写入文件
-            return FileAPI.write_file(file_path, updated_content)
+            # 一次打开完成读取和写回
+            with open(real_path, 'r+', encoding='utf-8') as file:
+                content = file.read()
+                # 没有要替换的内容时不写文件
+                if old_content not in content:
+                    return True
+                
+                # 替换内容并覆盖写回
+                file.seek(0)
+                file.write(content.replace(old_content, new_content))
+                file.truncate()
+            return True
         except Exception as e:
             print(f"编辑文件失败 {file_path}: {e}")
             return False
@@ -79,16 +91,12 @@ class FileAPI:
         :return: 成功返回True，失败返回False
         """
         try:
-            # 确保文件路径在kaos目录范围内
-            abs_path = os.path.abspath(file_path)
-            base_path = os.path.abspath(os.path.dirname(__file__) + "/../")
-            if not abs_path.startswith(base_path):
-                raise PermissionError("不允许访问kaos目录外的文件")
-                
+            real_path = FileAPI._check_path(file_path)
+            
             # 确保目录存在
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            os.makedirs(os.path.dirname(real_path), exist_ok=True)
             
-            with open(file_path, 'a', encoding='utf-8') as file:
+            with open(real_path, 'a', encoding='utf-8') as file:
                 file.write(content)
             return True
         except Exception as e:
@@ -0,0 +1,20 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON解析函数，安装了orjson时优先使用（接受str和bytes）
+json_loads = orjson.loads if orjson is not None else json.loads
+
+def json_dumps(data, sort_keys=False):
+    """
+    将数据序列化为紧凑的UTF-8 JSON字节串，安装了orjson时优先使用
+    :param data: 可序列化为JSON的数据
+    :param sort_keys: 是否按键排序
+    :return: JSON字节串
+    """
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(data, ensure_ascii=False, sort_keys=sort_keys, separators=(',', ':')).encode('utf-8')
@@ -2,30 +2,28 @@ import os
 import sys
 import datetime
 import threading
-import builtins
+import time
+import atexit
+import queue
 from typing import Optional
 from src.config_manager import get_config_manager
 
-# 保存原始print函数
-_original_print = builtins.print
+# 日志级别对应的数值
+_LEVELS = {
+    'DEBUG': 0,
+    'INFO': 1,
+    'WARNING': 2,
+    'ERROR': 3,
+    'CRITICAL': 4
+}
+
+# 后台写入线程每批最多写入的日志条数，日志暴增时限制单次拼接的字符串大小
+LOG_WRITE_BATCH = 1024
 
 class Logger:
-    _instance = None
-    _lock = threading.Lock()
-    
-    def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(Logger, cls).__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
+    """日志记录器，全局只应存在一个实例，请通过get_logger获取"""
     
     def __init__(self):
-        if self._initialized:
-            return
-            
-        self._initialized = True
         self.log_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'logs')
         self.log_file = None
         self.console_level = 'INFO'
@@ -37,6 +35,11 @@ class Logger:
         console_level, file_level = config_manager.get_log_levels()
         self.console_level = console_level
         self.file_level = file_level
+        # 级别数值在设置级别时计算一次，记录日志时直接比较
+        self._console_level_value = self._get_level_value(console_level)
+        self._file_level_value = self._get_level_value(file_level)
+        # 最近一次格式化的时间戳：(整秒, 字符串)，同一秒内的日志复用
+        self._timestamp_cache = (None, '')
         
         # 确保日志目录存在
         if not os.path.exists(self.log_directory):
@@ -47,12 +50,21 @@ class Logger:
         
         # 启动日志清理任务
         self._start_cleanup_task()
+        
+        # 文件日志由后台线程批量写入，记录日志的线程只需入队
+        self._file_queue = queue.SimpleQueue()
+        self._writer_thread = threading.Thread(target=self._file_writer_loop, name='log-writer', daemon=True)
+        self._writer_thread.start()
+        atexit.register(self.close)
     
     def _init_log_file(self):
-        """初始化日志文件"""
-        timestamp = datetime.datetime.now().strftime("%Y%m%d")
+        """初始化日志文件，并记录下一次切换日志文件的时间（次日零点）"""
+        today = datetime.date.today()
+        timestamp = today.strftime("%Y%m%d")
         log_filename = f"kaos_{timestamp}.log"
         self.log_file = os.path.join(self.log_directory, log_filename)
+        tomorrow = datetime.datetime.combine(today + datetime.timedelta(days=1), datetime.time())
+        self._rollover_at = tomorrow.timestamp()
     
     def _start_cleanup_task(self):
         """启动日志清理任务"""
@@ -62,18 +74,15 @@ class Logger:
     def _cleanup_old_logs(self):
         """清理旧日志文件"""
         try:
-            if not os.path.exists(self.log_directory):
-                return
-                
-            log_files = [f for f in os.listdir(self.log_directory) if f.endswith('.log')]
-            log_files.sort(key=lambda x: os.path.getmtime(os.path.join(self.log_directory, x)))
+            with os.scandir(self.log_directory) as entries:
+                log_files = [entry for entry in entries if entry.name.endswith('.log') and entry.is_file()]
             
-            # 保留最新的max_files个文件
+            # 保留最新的max_files个文件，数量未超出时无需读取修改时间
             if len(log_files) > self.max_files:
-                files_to_delete = log_files[:-self.max_files]
-                for file in files_to_delete:
+                log_files.sort(key=lambda entry: entry.stat().st_mtime)
+                for entry in log_files[:-self.max_files]:
                     try:
-                        os.remove(os.path.join(self.log_directory, file))
+                        os.remove(entry.path)
                     except Exception:
                         pass
         except Exception:
@@ -81,76 +90,161 @@ class Logger:
     
     def _get_level_value(self, level: str) -> int:
         """获取日志级别的数值"""
-        levels = {
-            'DEBUG': 0,
-            'INFO': 1,
-            'WARNING': 2,
-            'ERROR': 3,
-            'CRITICAL': 4
-        }
-        return levels.get(level.upper(), 1)
-    
-    def _should_log(self, level: str, target_level: str) -> bool:
-        """判断是否应该记录日志"""
-        return self._get_level_value(level) >= self._get_level_value(target_level)
+        value = _LEVELS.get(level)
+        if value is None:
+            value = _LEVELS.get(level.upper(), 1)
+        return value
+    
+    def _get_timestamp(self) -> str:
+        """获取当前时间戳字符串，同一秒内只格式化一次"""
+        now = int(time.time())
+        second, timestamp = self._timestamp_cache
+        if second != now:
+            timestamp = time.strftime("%m-%d %H:%M:%S", time.localtime(now))
+            self._timestamp_cache = (now, timestamp)
+        return timestamp
     
     def _format_message(self, level: str, message: str, plugin_name: Optional[str] = None) -> str:
         """格式化日志消息"""
-        timestamp = datetime.datetime.now().strftime("%m-%d %H:%M:%S")
-        if plugin_name:
-            return f"{timestamp} [{plugin_name}] {level}: {message}"
-        else:
-            return f"{timestamp} [core] {level}: {message}"
+        return f"{self._get_timestamp()} [{plugin_name or 'core'}] {level}: {message}"
     
     def _write_to_file(self, formatted_message: str):
-        """写入日志文件"""
-        try:
-            with open(self.log_file, 'a', encoding='utf-8') as f:
-                f.write(formatted_message + '\n')
-        except Exception:
-            pass  # 忽略文件写入错误
+        """将日志放入写入队列，由后台线程写入日志文件"""
+        self._file_queue.put(formatted_message)
+    
+    def _file_writer_loop(self):
+        """后台写入线程：取出队列中积压的日志（每批最多LOG_WRITE_BATCH条）一次写入，日期变化时切换到新的日志文件"""
+        file = None
+        stopping = False
+        while not stopping:
+            batch = [self._file_queue.get()]
+            while len(batch) < LOG_WRITE_BATCH:
+                try:
+                    batch.append(self._file_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            lines = []
+            waiters = []
+            for item in batch:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    lines.append(item)
+            
+            if lines:
+                try:
+                    if time.time() >= self._rollover_at:
+                        self._init_log_file()
+                        self._cleanup_old_logs()
+                        if file is not None:
+                            file.close()
+                            file = None
+                    if file is None:
+                        file = open(self.log_file, 'a', encoding='utf-8')
+                    file.write('\n'.join(lines) + '\n')
+                    file.flush()
+                except Exception:
+                    pass  # 忽略文件写入错误
+            
+            for waiter in waiters:
+                waiter.set()
+        
+        if file is not None:
+            file.close()
+    
+    def flush(self, timeout: float = 1.0):
+        """
+        等待此前记录的日志全部写入文件
+        :param timeout: 最长等待秒数
+        """
+        if not self._writer_thread.is_alive():
+            return
+        waiter = threading.Event()
+        self._file_queue.put(waiter)
+        waiter.wait(timeout)
+    
+    def close(self, timeout: float = 1.0):
+        """
+        写完队列中剩余的日志并停止后台写入线程
+        :param timeout: 最长等待秒数
+        """
+        if not self._writer_thread.is_alive():
+            return
+        self._file_queue.put(None)
+        self._writer_thread.join(timeout)
     
     def _write_to_console(self, formatted_message: str):
-        """写入控制台"""
-        _original_print(formatted_message)
-    
-    def log(self, level: str, message: str, plugin_name: Optional[str] = None):
-        """记录日志"""
+        """写入控制台，消息和换行符一次写入"""
+        try:
+            sys.stdout.write(formatted_message + '\n')
+        except Exception:
+            pass  # 没有可用的控制台（如sys.stdout为None）时忽略
+    
+    def is_enabled_for(self, level: str) -> bool:
+        """判断指定级别的日志是否会输出到控制台或文件"""
+        value = self._get_level_value(level)
+        return value >= self._console_level_value or value >= self._file_level_value
+    
+    def log(self, level: str, message: str, plugin_name: Optional[str] = None, *, args: tuple = ()):
+        """
+        记录日志
+        :param level: 日志级别
+        :param message: 日志消息，传入args时按%格式化
+        :param plugin_name: 插件名称
+        :param args: 格式化参数（仅限关键字传入），仅在日志实际输出时才进行格式化
+        """
+        # 级别方法传入的都是大写级别名，直接查表；其他写法再交给_get_level_value处理
+        value = _LEVELS.get(level)
+        if value is None:
+            value = self._get_level_value(level)
+        to_file = value >= self._file_level_value
+        to_console = value >= self._console_level_value
+        if not (to_file or to_console):
+            return
+        
+        if args:
+            message = message % args
+        
         # 格式化消息
         formatted_message = self._format_message(level, message, plugin_name)
         
         # 写入文件（如果级别足够）
-        if self._should_log(level, self.file_level):
+        if to_file:
             self._write_to_file(formatted_message)
         
         # 写入控制台（如果级别足够）
-        if self._should_log(level, self.console_level):
+        if to_console:
             self._write_to_console(formatted_message)
     
-    def debug(self, message: str, plugin_name: Optional[str] = None):
+    def debug(self, message: str, plugin_name: Optional[str] = None, *, args: tuple = ()):
         """记录DEBUG级别日志"""
-        self.log('DEBUG', message, plugin_name)
+        self.log('DEBUG', message, plugin_name, args=args)
     
-    def info(self, message: str, plugin_name: Optional[str] = None):
+    def info(self, message: str, plugin_name: Optional[str] = None, *, args: tuple = ()):
         """记录INFO级别日志"""
-        self.log('INFO', message, plugin_name)
+        self.log('INFO', message, plugin_name, args=args)
     
-    def warning(self, message: str, plugin_name: Optional[str] = None):
+    def warning(self, message: str, plugin_name: Optional[str] = None, *, args: tuple = ()):
         """记录WARNING级别日志"""
-        self.log('WARNING', message, plugin_name)
+        self.log('WARNING', message, plugin_name, args=args)
     
-    def error(self, message: str, plugin_name: Optional[str] = None):
+    def error(self, message: str, plugin_name: Optional[str] = None, *, args: tuple = ()):
         """记录ERROR级别日志"""
-        self.log('ERROR', message, plugin_name)
+        self.log('ERROR', message, plugin_name, args=args)
     
-    def critical(self, message: str, plugin_name: Optional[str] = None):
+    def critical(self, message: str, plugin_name: Optional[str] = None, *, args: tuple = ()):
         """记录CRITICAL级别日志"""
-        self.log('CRITICAL', message, plugin_name)
+        self.log('CRITICAL', message, plugin_name, args=args)
     
     def set_levels(self, console_level: str = 'INFO', file_level: str = 'INFO'):
         """设置日志级别"""
         self.console_level = console_level.upper()
         self.file_level = file_level.upper()
+        self._console_level_value = self._get_level_value(self.console_level)
+        self._file_level_value = self._get_level_value(self.file_level)
 
 # 全局日志实例
 logger = Logger()
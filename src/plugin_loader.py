@@ -1,183 +1,256 @@
 import os
+import sys
 import json
 import importlib.util
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from src.api_registry import api_registry
 from src.logger import get_logger
+from src.json_utils import json_loads
 
 # 获取全局日志实例
 logger = get_logger()
 
+# 清单必需字段
+REQUIRED_MANIFEST_FIELDS = ('version', 'pluginName', 'Developer', 'Permission', 'InstallationLevel')
+# 有效的权限级别
+VALID_PERMISSIONS = frozenset({'System', 'User', 'Visitor'})
+# 有效的安装级别
+VALID_INSTALLATION_LEVELS = frozenset({'Admin', 'Normal'})
+
 class PluginLoader:
     def __init__(self, plugins_dir):
         self.plugins_dir = plugins_dir
         self.plugins = []
+        # 按依赖关系分层的已加载插件，每一层只依赖之前层中的插件，同一层可并行启动
+        self.plugin_layers = []
+        # 已加载插件的名称
+        self._loaded_names = set()
+        # 插件目录中清单有效的插件名称，由load_plugins扫描时填充
+        self._known_plugin_names = set()
+        # 插件列表版本号，每加载一个插件递增，供调用方判断缓存是否失效
+        self.version = 0
+        # 插件列表变化通知，供等待方在版本号变化时立即被唤醒
+        self._version_changed = threading.Condition()
 
     def load_plugins(self):
-        if not os.path.exists(self.plugins_dir):
+        # 收集所有插件目录
+        try:
+            # scandir的目录项自带文件类型，判断是否为目录无需再次stat
+            with os.scandir(self.plugins_dir) as entries:
+                plugin_dirs = [entry.path for entry in entries if entry.is_dir()]
+        except FileNotFoundError:
             logger.warning(f"Plugins directory {self.plugins_dir} does not exist.")
             return
 
+        # 并发读取所有清单，慢速存储上不必逐个等待文件读取
+        if len(plugin_dirs) > 1:
+            max_workers = min(len(plugin_dirs), 32, (os.cpu_count() or 1) + 4)
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='manifest-read') as executor:
+                manifests = list(executor.map(self._read_manifest, plugin_dirs))
+        else:
+            manifests = [self._read_manifest(plugin_dir) for plugin_dir in plugin_dirs]
+
         # 收集所有插件信息
         plugin_infos = []
-        for item in os.listdir(self.plugins_dir):
-            plugin_dir = os.path.join(self.plugins_dir, item)
-            if os.path.isdir(plugin_dir):
-                manifest_path = os.path.join(plugin_dir, '_manifest.json')
-                if os.path.exists(manifest_path):
-                    try:
-                        with open(manifest_path, 'r', encoding='utf-8') as f:
-                            manifest = json.load(f)
-                        if self.validate_manifest(manifest):
-                            plugin_infos.append({
-                                'dir': plugin_dir,
-                                'manifest': manifest,
-                                'dependencies': manifest.get('dependencies', [])
-                            })
-                    except Exception as e:
-                        logger.error(f"Failed to read manifest in {plugin_dir}: {e}")
-
-        # 按依赖关系排序插件
-        sorted_plugins = self._sort_plugins_by_dependencies(plugin_infos)
-        
-        # 按排序后的顺序加载插件
-        for plugin_info in sorted_plugins:
-            self.load_plugin_from_dir(plugin_info['dir'])
+        for plugin_dir, manifest in zip(plugin_dirs, manifests):
+            if manifest is not None and self.validate_manifest(manifest):
+                plugin_infos.append({
+                    'dir': plugin_dir,
+                    'manifest': manifest,
+                    'dependencies': manifest.get('dependencies', []),
+                    # 可选依赖只影响加载和启动顺序，缺失时插件仍会加载
+                    'optional_dependencies': manifest.get('optionalDependencies', [])
+                })
+
+        self._known_plugin_names = {info['manifest']['pluginName'] for info in plugin_infos}
 
-    def _sort_plugins_by_dependencies(self, plugin_infos):
+        # 按依赖关系分层，逐层加载插件，并记录加载成功的插件所在的层
+        for layer in self._layer_plugins_by_dependencies(plugin_infos):
+            loaded = []
+            for plugin_info in layer:
+                plugin = self.load_plugin_from_dir(plugin_info['dir'], plugin_info['manifest'])
+                if plugin is not None:
+                    loaded.append(plugin)
+            if loaded:
+                self.plugin_layers.append(loaded)
+
+    def _read_manifest(self, plugin_dir):
+        """
+        读取插件目录中的_manifest.json，直接打开而不预先检查文件是否存在
+        :param plugin_dir: 插件目录
+        :return: 清单字典，文件不存在或读取失败时返回None
         """
-        根据依赖关系对插件进行排序，确保依赖的插件先加载
+        manifest_path = os.path.join(plugin_dir, '_manifest.json')
+        try:
+            with open(manifest_path, 'rb') as f:
+                return json_loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Failed to read manifest in {plugin_dir}: {e}")
+            return None
+
+    def _layer_plugins_by_dependencies(self, plugin_infos):
+        """
+        根据依赖关系（含可选依赖）对插件分层，确保依赖的插件在之前的层中
         :param plugin_infos: 插件信息列表
-        :return: 排序后的插件信息列表
+        :return: 插件信息的分层列表，每一层只依赖之前层中的插件
         """
         # 创建插件名称到插件信息的映射
         plugin_map = {info['manifest']['pluginName']: info for info in plugin_infos}
         
-        # 使用拓扑排序对插件进行排序
-        sorted_plugins = []
-        visited = set()
-        temp_visited = set()
-        
-        def visit(plugin_info):
-            plugin_name = plugin_info['manifest']['pluginName']
-            
-            # 如果已经访问过，直接返回
-            if plugin_name in visited:
-                return
-            
-            # 如果在临时访问集合中，说明存在循环依赖
-            if plugin_name in temp_visited:
-                logger.warning(f"检测到插件 {plugin_name} 存在循环依赖")
-                return
-            
-            # 标记为临时访问
-            temp_visited.add(plugin_name)
-            
-            # 递归访问所有依赖的插件
+        # 使用Kahn算法进行拓扑排序：入度为依赖的插件数，dependents记录依赖某插件的插件
+        in_degree = dict.fromkeys(plugin_map, 0)
+        dependents = defaultdict(list)
+        for plugin_name, plugin_info in plugin_map.items():
             for dep in plugin_info['dependencies']:
                 if dep in plugin_map:
-                    visit(plugin_map[dep])
+                    in_degree[plugin_name] += 1
+                    dependents[dep].append(plugin_name)
                 else:
                     logger.warning(f"插件 {plugin_name} 依赖的插件 {dep} 不存在")
-            
-            # 标记为已访问并添加到结果中
-            temp_visited.remove(plugin_name)
-            visited.add(plugin_name)
-            sorted_plugins.append(plugin_info)
+            for dep in plugin_info['optional_dependencies']:
+                if dep in plugin_map:
+                    in_degree[plugin_name] += 1
+                    dependents[dep].append(plugin_name)
+        
+        # 无依赖的插件按原顺序组成第一层，之后每层为依赖全部位于之前层的插件
+        ready = [name for name, degree in in_degree.items() if degree == 0]
+        layers = []
+        placed = 0
+        while ready:
+            layers.append([plugin_map[plugin_name] for plugin_name in ready])
+            placed += len(ready)
+            next_ready = []
+            for plugin_name in ready:
+                for dependent in dependents[plugin_name]:
+                    in_degree[dependent] -= 1
+                    if in_degree[dependent] == 0:
+                        next_ready.append(dependent)
+            ready = next_ready
         
-        # 对所有插件进行拓扑排序
-        for plugin_info in plugin_infos:
-            if plugin_info['manifest']['pluginName'] not in visited:
-                visit(plugin_info)
+        # 剩余插件处于循环依赖中，按原顺序作为最后一层，由加载时的依赖检查处理
+        if placed < len(plugin_map):
+            cyclic = []
+            for plugin_name, degree in in_degree.items():
+                if degree > 0:
+                    logger.warning(f"检测到插件 {plugin_name} 存在循环依赖")
+                    cyclic.append(plugin_map[plugin_name])
+            layers.append(cyclic)
         
-        return sorted_plugins
+        return layers
 
-    def load_plugin_from_dir(self, plugin_dir):
-        # Check for manifest file
-        manifest_path = os.path.join(plugin_dir, '_manifest.json')
-        if not os.path.exists(manifest_path):
-            logger.warning(f"Manifest file not found in {plugin_dir}")
-            return
+    def load_plugin_from_dir(self, plugin_dir, manifest=None):
+        """
+        从插件目录加载插件
+        :param plugin_dir: 插件目录
+        :param manifest: 已读取并校验过的清单，提供时不再重复读取和校验
+        :return: 加载成功的插件 {'manifest', 'module'}，失败时返回None
+        """
+        if manifest is None:
+            # Check for manifest file
+            manifest_path = os.path.join(plugin_dir, '_manifest.json')
+            if not os.path.exists(manifest_path):
+                logger.warning(f"Manifest file not found in {plugin_dir}")
+                return None
 
-        # Load and validate manifest
-        try:
-            with open(manifest_path, 'r', encoding='utf-8') as f:
-                manifest = json.load(f)
-            if not self.validate_manifest(manifest):
-                logger.warning(f"Invalid manifest in {plugin_dir}")
-                return
-        except Exception as e:
-            logger.error(f"Failed to read manifest in {plugin_dir}: {e}")
-            return
+            # Load and validate manifest
+            try:
+                with open(manifest_path, 'rb') as f:
+                    manifest = json_loads(f.read())
+                if not self.validate_manifest(manifest):
+                    logger.warning(f"Invalid manifest in {plugin_dir}")
+                    return None
+            except Exception as e:
+                logger.error(f"Failed to read manifest in {plugin_dir}: {e}")
+                return None
 
         # Check dependencies (已通过排序确保依赖项已加载)
         if 'dependencies' in manifest:
             for dep in manifest['dependencies']:
                 if not self.check_dependency(dep):
                     logger.warning(f"未检测到注明的依赖模块 {dep}，该模块可能无法运行")
-                    return
+                    return None
 
         # Load plugin module
         plugin_py_path = os.path.join(plugin_dir, 'plugin.py')
         if not os.path.exists(plugin_py_path):
             logger.warning(f"plugin.py not found in {plugin_dir}")
-            return
+            return None
 
+        module_name = manifest['pluginName']
+        registered = False
         try:
-            spec = importlib.util.spec_from_file_location(manifest['pluginName'], plugin_py_path)
+            # 以插件目录作为包路径，插件内可用相对导入引用同目录下的其他模块
+            spec = importlib.util.spec_from_file_location(
+                module_name, plugin_py_path, submodule_search_locations=[plugin_dir]
+            )
             plugin_module = importlib.util.module_from_spec(spec)
+            # 执行前登记到sys.modules，相对导入需要能找到父模块；名称已被其他模块占用时不覆盖
+            if module_name not in sys.modules:
+                sys.modules[module_name] = plugin_module
+                registered = True
+            else:
+                logger.warning(f"模块名 {module_name} 已被占用，插件 {plugin_dir} 内的相对导入将不可用")
             spec.loader.exec_module(plugin_module)
             
             # Add api_registry to plugin module so it can register its APIs
             plugin_module.api_registry = api_registry
             
-            self.plugins.append({
+            plugin = {
                 'manifest': manifest,
                 'module': plugin_module
-            })
+            }
+            self.plugins.append(plugin)
+            self._loaded_names.add(manifest['pluginName'])
+            with self._version_changed:
+                self.version += 1
+                self._version_changed.notify_all()
+            return plugin
         except Exception as e:
+            if registered:
+                sys.modules.pop(module_name, None)
             logger.error(f"Failed to load plugin {plugin_dir}: {e}")
+            return None
 
     def check_dependency(self, dependency_name):
-        # Check if dependency plugin is already loaded
-        for plugin in self.plugins:
-            if plugin['manifest']['pluginName'] == dependency_name:
-                return True
-        # Also check if dependency exists in plugin directory
-        for item in os.listdir(self.plugins_dir):
-            plugin_dir = os.path.join(self.plugins_dir, item)
-            if os.path.isdir(plugin_dir):
-                manifest_path = os.path.join(plugin_dir, '_manifest.json')
-                if os.path.exists(manifest_path):
-                    try:
-                        with open(manifest_path, 'r', encoding='utf-8') as f:
-                            manifest = json.load(f)
-                        if manifest.get('pluginName') == dependency_name:
-                            return True
-                    except:
-                        continue
-        return False
+        # 依赖插件已加载，或存在于插件目录中
+        return dependency_name in self._loaded_names or dependency_name in self._known_plugin_names
 
     def validate_manifest(self, manifest):
         # Required fields based on the example
-        required_fields = ['version', 'pluginName', 'Developer', 'Permission', 'InstallationLevel']
-        for field in required_fields:
+        for field in REQUIRED_MANIFEST_FIELDS:
             if field not in manifest:
                 logger.warning(f"Missing required field in manifest: {field}")
                 return False
 
-        # Validate permission level
-        valid_permissions = ['System', 'User', 'Visitor']
-        if manifest['Permission'] not in valid_permissions:
+        # Validate permission level (非字符串值无法在frozenset中查找，直接视为无效)
+        if not isinstance(manifest['Permission'], str) or manifest['Permission'] not in VALID_PERMISSIONS:
             logger.warning(f"Invalid permission level in manifest: {manifest['Permission']}")
             return False
 
         # Validate installation level
-        valid_installation_levels = ['Admin', 'Normal']
-        if manifest['InstallationLevel'] not in valid_installation_levels:
+        if not isinstance(manifest['InstallationLevel'], str) or manifest['InstallationLevel'] not in VALID_INSTALLATION_LEVELS:
             logger.warning(f"Invalid installation level in manifest: {manifest['InstallationLevel']}")
             return False
 
         return True
 
     def get_plugins(self):
-        return self.plugins
\ No newline at end of file
+        return self.plugins
+
+    def get_plugin_layers(self):
+        """获取按依赖关系分层的已加载插件，每一层只依赖之前层中的插件"""
+        return self.plugin_layers
+
+    def wait_for_change(self, version, timeout=None):
+        """等待插件列表版本号变化
+        :param version: 调用方已知的版本号
+        :param timeout: 最长等待秒数，None表示一直等待
+        :return: 当前版本号
+        """
+        with self._version_changed:
+            self._version_changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
\ No newline at end of file
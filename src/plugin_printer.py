@@ -1,5 +1,6 @@
 import sys
 import threading
+import contextvars
 import builtins
 from contextlib import contextmanager
 from src.logger import get_logger
@@ -8,46 +9,81 @@ from src.logger import get_logger
 _original_print = builtins.print
 logger = get_logger()
 
+# 当前插件名称，每个线程（及每个异步任务）各自独立
+_current_plugin = contextvars.ContextVar('current_plugin', default=None)
+
 class PluginPrinter:
     """插件打印处理器，用于在插件print输出前添加插件名称前缀"""
     
-    _local = threading.local()
-    
     @classmethod
     def set_current_plugin(cls, plugin_name):
-        """设置当前插件名称"""
-        cls._local.current_plugin = plugin_name
+        """
+        设置当前插件名称
+        :param plugin_name: 插件名称，None表示清除
+        :return: 可传给reset_current_plugin的令牌，用于恢复设置前的名称
+        """
+        return _current_plugin.set(plugin_name)
+    
+    @classmethod
+    def reset_current_plugin(cls, token):
+        """
+        恢复set_current_plugin之前的插件名称，嵌套的插件上下文退出后回到外层插件
+        :param token: set_current_plugin返回的令牌
+        """
+        _current_plugin.reset(token)
     
     @classmethod
     def get_current_plugin(cls):
         """获取当前插件名称"""
-        return getattr(cls._local, 'current_plugin', None)
+        return _current_plugin.get()
     
     @classmethod
     def print(cls, *args, **kwargs):
         """带插件前缀的print函数"""
-        plugin_name = cls.get_current_plugin()
+        plugin_name = _current_plugin.get()
         if plugin_name:
-            # 构造带插件前缀的消息
-            message = ' '.join(str(arg) for arg in args)
+            # 构造带插件前缀的消息，最常见的单个字符串参数直接使用
+            if len(args) == 1 and type(args[0]) is str:
+                message = args[0]
+            else:
+                message = ' '.join(map(str, args))
             # 使用logger记录INFO级别日志，这样会自动添加时间戳和插件名称
             logger.info(message, plugin_name=plugin_name)
         else:
             # 没有插件上下文时使用原始print
             _original_print(*args, **kwargs)
 
+# print替换的引用计数，多个线程同时处于插件上下文时只在最后一个退出后恢复
+_print_swap_lock = threading.Lock()
+_print_swap_depth = 0
+
+def install_plugin_printer():
+    """将print替换为带插件前缀的版本（可重复调用，需与uninstall_plugin_printer成对使用）"""
+    global _print_swap_depth
+    with _print_swap_lock:
+        if _print_swap_depth == 0:
+            builtins.print = PluginPrinter.print
+        _print_swap_depth += 1
+
+def uninstall_plugin_printer():
+    """撤销一次install_plugin_printer，最后一次撤销时恢复原始print函数"""
+    global _print_swap_depth
+    with _print_swap_lock:
+        _print_swap_depth -= 1
+        if _print_swap_depth == 0:
+            builtins.print = _original_print
+
 # 上下文管理器，用于设置插件上下文
 @contextmanager
 def plugin_context(plugin_name):
-    """插件执行上下文管理器"""
+    """插件执行上下文管理器（可在多个线程中同时使用）"""
     # 设置当前插件名称
-    PluginPrinter.set_current_plugin(plugin_name)
+    token = PluginPrinter.set_current_plugin(plugin_name)
     # 临时替换print函数
-    builtins.print = PluginPrinter.print
+    install_plugin_printer()
     try:
         yield
     finally:
-        # 恢复原始print函数
-        builtins.print = _original_print
-        # 清除当前插件名称
-        PluginPrinter.set_current_plugin(None)
\ No newline at end of file
+        uninstall_plugin_printer()
+        # 恢复进入上下文前的插件名称
+        PluginPrinter.reset_current_plugin(token)